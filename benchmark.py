@@ -0,0 +1,170 @@
+"""Замеры скорости упаковки на синтетических заказах
+
+Пример запуска::
+
+    python benchmark.py --sizes 100 1000 10000 --output bench.json
+    python benchmark.py --sizes 100 1000 --compare bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from random import Random
+
+from spp.ph import packaging, phspprg, phsbpprg, sort_rectangles, normalize_rectangles
+
+
+DISTRIBUTIONS = ('uniform', 'normal', 'lognormal')
+ENTRY_POINTS = ('packaging', 'phspprg', 'phsbpprg')
+
+
+def generate_order(n, seed=0, thicknesses=3, priorities=3, distribution='uniform',
+                   duplicates=0., min_size=50, max_size=1000):
+    """Синтетический заказ из n прямоугольников
+
+    Parameters
+    ----------
+    n : int
+        Общее количество прямоугольников.
+    seed : int
+        Начальное значение генератора, одинаковые параметры дают одинаковый заказ.
+    thicknesses : int
+        Количество групп толщин: 3.0, 2.5, 2.0, ...
+    priorities : int
+        Количество приоритетов в каждой группе толщин.
+    distribution : str, {'uniform', 'normal', 'lognormal'}
+        Распределение размеров прямоугольников.
+    duplicates : float
+        Доля прямоугольников, выбираемых из небольшого набора типовых размеров.
+    min_size, max_size : int
+        Границы размеров.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution}, expected one of {DISTRIBUTIONS}.")
+    rng = Random(seed)
+    mid, spread = (min_size + max_size) / 2, (max_size - min_size) / 6
+
+    def size():
+        if distribution == 'uniform':
+            v = rng.uniform(min_size, max_size)
+        elif distribution == 'normal':
+            v = rng.gauss(mid, spread)
+        else:
+            v = min_size * rng.lognormvariate(0, 0.75)
+        return int(min(max(v, min_size), max_size))
+
+    types = [(size(), size()) for _ in range(max(1, n // 100))]
+    heights = [3.0 - 0.5 * i for i in range(thicknesses)]
+    order = {h: {p: [] for p in range(1, priorities + 1)} for h in heights}
+    for _ in range(n):
+        r = rng.choice(types) if rng.random() < duplicates else (size(), size())
+        order[rng.choice(heights)][rng.randint(1, priorities)].append(r)
+    return order
+
+
+def run_entry(entry, width, length, order, sorting):
+    """Запуск одной точки входа, возвращает (размещено, площадь деталей, площадь полос)"""
+    if entry == 'packaging':
+        res, _, length_marking, _ = packaging(width, length, order, sorting=sorting)
+        # полосы каждой толщины измеряются в своих координатах
+        used = sum(length_marking.values())
+    else:
+        # самая толстая группа, как первая полоса в packaging
+        h = max(order)
+        rectangles, indices = sort_rectangles(normalize_rectangles({h: order[h]}), sorting)
+        if entry == 'phspprg':
+            used, rect = phspprg(width, rectangles[h], indices[h])
+        else:
+            used, rect = phsbpprg(width, length, rectangles[h], indices[h])
+        res = {h: rect}
+    placed = [r for group in res.values() for list_r in group.values() for r in list_r]
+    return len(placed), sum(r.w * r.l for r in placed), width * used
+
+
+def measure(entry, width, length, order, sorting, repeat=1):
+    """Время, пиковая память, скорость размещения и заполнение листа"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        placed, placed_area, used_area = run_entry(entry, width, length, order, sorting)
+        times.append(time.perf_counter() - start)
+    # память замеряется отдельным запуском, так как tracemalloc замедляет работу
+    tracemalloc.start()
+    run_entry(entry, width, length, order, sorting)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    wall = min(times)
+    return {
+        'wall_time': wall,
+        'peak_memory': peak,
+        'placed': placed,
+        'placements_per_second': placed / wall if wall > 0 else 0.,
+        'utilization': placed_area / used_area if used_area else 0.,
+    }
+
+
+def run(sizes, entries=ENTRY_POINTS, seed=0, thicknesses=3, priorities=3,
+        distribution='uniform', duplicates=0., width=3000, sorting='width', repeat=1):
+    results = []
+    for n in sizes:
+        order = generate_order(n, seed=seed, thicknesses=thicknesses, priorities=priorities,
+                               distribution=distribution, duplicates=duplicates)
+        # длина листа примерно вмещает весь заказ
+        length = sum(r[0] * r[1] for g in order.values() for l in g.values() for r in l) // width
+        params = {'n': n, 'seed': seed, 'thicknesses': thicknesses, 'priorities': priorities,
+                  'distribution': distribution, 'duplicates': duplicates,
+                  'width': width, 'length': length, 'sorting': sorting}
+        for entry in entries:
+            record = {'entry': entry, **params, **measure(entry, width, length, order, sorting, repeat)}
+            results.append(record)
+            print(f"{entry:>10} n={n:<7d} {record['wall_time']:9.4f} s "
+                  f"{record['peak_memory'] / 2**20:8.2f} MiB "
+                  f"{record['placements_per_second']:10.0f} pl/s "
+                  f"util={record['utilization']:.3f}")
+    return results
+
+
+def compare(results, baseline):
+    """Отношение времени к предыдущему запуску с теми же параметрами"""
+    key = lambda r: tuple(r[k] for k in ('entry', 'n', 'seed', 'thicknesses', 'priorities',
+                                         'distribution', 'duplicates', 'width', 'sorting'))
+    old = {key(r): r for r in baseline['results']}
+    for r in results:
+        if key(r) in old:
+            ratio = r['wall_time'] / old[key(r)]['wall_time']
+            print(f"{r['entry']:>10} n={r['n']:<7d} time x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--entries', nargs='+', choices=ENTRY_POINTS, default=list(ENTRY_POINTS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--thicknesses', type=int, default=3)
+    parser.add_argument('--priorities', type=int, default=3)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--duplicates', type=float, default=0.)
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--sorting', choices=('width', 'length'), default='width')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', help='файл для записи результатов в формате JSON')
+    parser.add_argument('--compare', help='файл с результатами предыдущего запуска')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.entries, seed=args.seed, thicknesses=args.thicknesses,
+                  priorities=args.priorities, distribution=args.distribution,
+                  duplicates=args.duplicates, width=args.width, sorting=args.sorting,
+                  repeat=args.repeat)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version, 'platform': platform.platform(),
+                       'results': results}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,28 @@
-from random import random
-
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
-from spp.visualize import create_grad, get_annotation
+from spp.visualize import create_grad, layout_arrays, patch_collection, add_labels, on_move, GridIndex
 from .mpl_canvas import MlpCanvas
 
 
 class CanvasCuttingChart(MlpCanvas):
-    def create_graph(self, width, length, h, rectangles, label_on_rect=False):
-        rectangles_with_annotation = []
+    def create_graph(self, width, length, h, rectangles, label_on_rect=False, lod=None):
         self.patch_rect((0, 0), width, length, hatch='x', fill=False)
-        for p, list_r in rectangles.items():
-            for r in list_r:
-                obj = self.patch_rect((r.x, r.y), r.w, r.l, color=(random(), random(), random()), ec='k', lw=0.5)
-                if label_on_rect:
-                    self.axis.text(r.x + 0.5 * r.w, r.y + 0.5 * r.l, str(r.idx))
-                description = (f'Деталь:\nТолщина: {h:.1f}\n'
-                               f'Приоритет: {p:d}\n'
-                               f'Размеры: {r.w:.2f}$\\times${r.l:.2f}\n'
-                               f'Координаты: ({r.x:.2f}, {r.y:.2f})')
-                annot = get_annotation(self.axis, description, (r.x, r.y), (0, 0))
-                rectangles_with_annotation.append((obj, annot))
+        list_r = [r for p, list_r in rectangles.items() for r in list_r]
+        xywl = layout_arrays(list_r)
+        patch_collection(self.axis, xywl, np.random.random((len(list_r), 3)), edgecolors='k', linewidths=0.5)
         self.axis.set_xlim(0, width)
         self.axis.set_ylim(0, length)
+        if label_on_rect:
+            add_labels(self.axis, xywl, [str(r.idx) for r in list_r], lod=lod)
+        pieces = [(h, p) for p, list_r in rectangles.items() for r in list_r]
         self.axis.title.set_text(f'Толщина {h} мм')
         self.axis.set_xlabel(f'$x$')
         self.axis.set_ylabel(f'$y$')
         self.axis.set_aspect('equal', adjustable='box')
-        on_move_id = self.fig.canvas.mpl_connect('button_press_event', self.on_move(rectangles_with_annotation))
+        charts = {self.axis: (GridIndex(xywl), pieces)}
+        on_move_id = self.fig.canvas.mpl_connect('button_press_event', self.on_move(charts))
 
     
     def patch_rect(self, xy, w, h, **kwargs):
@@ -38,22 +32,5 @@ class CanvasCuttingChart(MlpCanvas):
         return obj
 
     
-    def on_move(self, rectangles_with_annotation):
-        def inner(event):
-            if event.button == 1:
-                for rectangle, annotation in rectangles_with_annotation:
-                    if event.xdata is not None and event.ydata is not None:
-                        x0, y0 = rectangle.get_xy()
-                        h = rectangle.get_height()
-                        w = rectangle.get_width()
-                        if (x0 < event.xdata < x0 + w) and (y0 < event.ydata < y0 + h):
-                            annotation.set_position((x0+w, y0))
-                            annotation.xy = (x0, y0)
-                            annotation.set_visible(True)
-                        else:
-                            annotation.set_visible(False)
-            else:
-                for rectangle, annotation in rectangles_with_annotation:
-                    annotation.set_visible(False)
-            self.fig.canvas.draw()
-        return inner
+    def on_move(self, charts):
+        return on_move(self.fig, charts)
@@ -2,15 +2,17 @@ from PyQt5 import QtCore
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QDockWidget)
 
-from spp.ph import packaging
 from spp.support import items_by_index, area
 
 from .graph import CanvasCuttingChart
+from .worker import PackingWorker, start_packing
 
 
 class UiMainWindow:
     def __init__(self):
         self.draw_btn = None
+        self.cancel_btn = None
+        self.progress = None
         self.h_box_cutting_chart = None
 
         self.sheet_area = None
@@ -30,11 +32,18 @@ class UiMainWindow:
         
         # кнопка
         self.draw_btn = QPushButton()
+        self.cancel_btn = QPushButton()
+        self.cancel_btn.setEnabled(False)
         h_box_button = QHBoxLayout()
         h_box_button.addWidget(self.draw_btn)
+        h_box_button.addWidget(self.cancel_btn)
         h_box_button.addStretch(1)
         main_v_box.addLayout(h_box_button)
 
+        # ход упаковки
+        self.progress = QLabel()
+        main_v_box.addWidget(self.progress)
+
         # текстовы поля
         self.sheet_area = QLabel()
         self.min_area = QLabel()
@@ -60,6 +69,7 @@ class UiMainWindow:
     def retranslate_ui(self, main_window):
         main_window.setWindowTitle(self.translate("MainWindow", "Карта раскроя"))
         self.draw_btn.setText(self.translate("MainWindow", "Построить график"))
+        self.cancel_btn.setText(self.translate("MainWindow", "Отменить"))
     
     def translate(self, text, text_1):
         return QtCore.QCoreApplication.translate(text, text_1)
@@ -74,11 +84,48 @@ class MainWindow(QMainWindow):
         self.cutting_charts = []
 
         self.ui.draw_btn.clicked.connect(self.draw)
+        self.ui.cancel_btn.clicked.connect(self.cancel)
 
         self.dockers = []
+
+        # упаковка выполняется в отдельном потоке, см. PackingWorker
+        self.worker = None
+        self.packing_thread = None
+        self.order = None
+        self.placed = {}
         
     
     def draw(self):
+        """Запуск упаковки примера, графики строятся по сигналу finished"""
+        if self.packing_thread is not None:
+            return
+        self.placed = {}
+        self.order = (25, 55, self.example())
+        self.worker = PackingWorker(*self.order, rounding_func=lambda x: round(x, 1), sorting="width")
+        # слоты - методы окна, поэтому вызываются в потоке интерфейса
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.cancelled.connect(self.on_cancelled)
+        self.packing_thread = start_packing(self.worker, self, done=self.packing_done)
+        self.ui.draw_btn.setEnabled(False)
+        self.ui.cancel_btn.setEnabled(True)
+        self.ui.progress.setText('Упаковка...')
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.ui.cancel_btn.setEnabled(False)
+
+    def on_progress(self, height, placed, total):
+        self.placed[height] = (placed, total)
+        text = ', '.join(f'{h:.1f} мм: {n}/{t}' for h, (n, t) in self.placed.items())
+        self.ui.progress.setText(f'Размещено {text}')
+
+    def on_finished(self, result):
+        width, length, rect = self.order
+        self.ui.cancel_btn.setEnabled(False)
+        self.ui.progress.setText('')
         self.cutting_charts = []
         if self.dockers:
             for dock in self.dockers:
@@ -86,17 +133,40 @@ class MainWindow(QMainWindow):
                 dock[0].setParent(None)
         self.dockers = []
 
-        length_marking, groups = self.example(25, 55)
+        length_marking, groups = self.show_stats(width, length, rect, result)
 
         for h, group in groups.items():
-            graph = CanvasCuttingChart(width=25, height=length_marking[h])
+            graph = CanvasCuttingChart(width=width, height=length_marking[h])
             self.cutting_charts.append(graph)
-            self.create_dock_with_graph(graph, 25, length_marking[h], h, group,
+            self.create_dock_with_graph(graph, width, length_marking[h], h, group,
                                         xlabel='$x$', ylabel='$y$', 
                                         title=f'Карта раскроя ({h:.1f} мм)')
+
+    def on_failed(self, message):
+        self.ui.cancel_btn.setEnabled(False)
+        self.ui.progress.setText(f'Ошибка упаковки: {message}')
+
+    def on_cancelled(self):
+        self.ui.cancel_btn.setEnabled(False)
+        self.ui.progress.setText('Упаковка отменена')
+
+    def packing_done(self):
+        """Слот QThread.finished: поток остановлен, ссылки можно освободить"""
+        self.worker = None
+        self.packing_thread = None
+        self.ui.draw_btn.setEnabled(True)
+        self.ui.cancel_btn.setEnabled(False)
+
+    def closeEvent(self, event):
+        """Отмена упаковки и ожидание потока при закрытии окна"""
+        if self.packing_thread is not None:
+            self.worker.cancel()
+            self.packing_thread.quit()
+            self.packing_thread.wait()
+        super().closeEvent(event)
             
 
-    def example(self, width, length):
+    def example(self):
         rect = {
             3.0: {  # ширина w, длина l
                 1: [(5, 3), (5, 3), (5, 5), (10, 10), (20, 14)],
@@ -116,15 +186,15 @@ class MainWindow(QMainWindow):
                 3: [(10, 10), (12, 6), (8, 7)],
             },
         }
+        return rect
 
+    def show_stats(self, width, length, rect, result):
         count = 0
         for h, group in rect.items():
             for p, list_r in group.items():
                 count += len(list_r)
 
-        res, unplaced_idx, len_m, unused_l = packaging(width, length, rect, 
-                                                       rounding_func=lambda x: round(x, 1), 
-                                                       sorting="width")
+        res, unplaced_idx, len_m, unused_l = result
         
         unplaced = items_by_index(rect, unplaced_idx)
 
@@ -0,0 +1,107 @@
+import time
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from spp.ph import packaging
+
+
+class PackingCancelled(Exception):
+    """Упаковка отменена пользователем"""
+
+
+class PackingWorker(QObject):
+    """Упаковка заказа в отдельном потоке
+
+    Объект переносится в QThread (см. start_packing), а результат и ход
+    работы передаются в поток интерфейса через сигналы. Сигнал progress
+    отправляется не чаще одного раза в interval секунд, чтобы очередь
+    событий интерфейса не переполнялась на больших заказах. Значение,
+    при котором размещены все прямоугольники толщины, отправляется
+    всегда, а пропущенные последние значения - перед finished.
+
+    Signals
+    -------
+    progress(float, int, int)
+        Толщина, количество размещенных прямоугольников этой толщины и
+        общее количество прямоугольников толщины в заказе.
+    finished(object)
+        Результат packaging.
+    failed(str)
+        Текст исключения, возникшего при упаковке.
+    cancelled()
+        Упаковка прервана вызовом cancel.
+    """
+    progress = pyqtSignal(float, int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, width, length, rectangles, interval=0.1, **kwargs):
+        super().__init__()
+        self.width = width
+        self.length = length
+        self.rectangles = rectangles
+        self.interval = interval
+        self.kwargs = kwargs
+        self.totals = {h: sum(len(list_r) for list_r in group.values())
+                       for h, group in rectangles.items()}
+        self._cancelled = False
+        self._last = 0.
+        self._unsent = {}  # значения, пропущенные из-за ограничения частоты
+
+    def cancel(self):
+        """Запрос отмены, вызывается из потока интерфейса
+
+        Флаг проверяется после каждой полосы и каждые PROGRESS_STEP
+        размещений при упаковке листа фиксированной длины.
+        """
+        self._cancelled = True
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = packaging(self.width, self.length, self.rectangles,
+                               progress=self.on_progress, **self.kwargs)
+        except PackingCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(f'{type(e).__name__}: {e}')
+        else:
+            for height, placed in self._unsent.items():
+                self.progress.emit(height, placed, self.totals[height])
+            self.finished.emit(result)
+
+    def on_progress(self, height, placed):
+        if self._cancelled:
+            raise PackingCancelled
+        now = time.monotonic()
+        # последнее значение толщины отправляется всегда
+        if placed >= self.totals[height] or now - self._last >= self.interval:
+            self._last = now
+            self._unsent.pop(height, None)
+            self.progress.emit(height, placed, self.totals[height])
+        else:
+            self._unsent[height] = placed
+
+
+def start_packing(worker, parent=None, done=None):
+    """Запуск worker в новом потоке, возвращает поток
+
+    Поток завершается после любого из сигналов finished, failed или
+    cancelled, затем поток и worker удаляются через deleteLater. Поток
+    создается с родителем parent, поэтому не удаляется сборщиком мусора
+    Python, пока работает его цикл событий. Ссылки на поток и worker
+    можно освобождать только в слоте done, который подключается к
+    QThread.finished до запуска потока.
+    """
+    thread = QThread(parent)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    for signal in (worker.finished, worker.failed, worker.cancelled):
+        signal.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    if done is not None:
+        thread.finished.connect(done)
+    thread.start()
+    return thread
@@ -0,0 +1,294 @@
+import os
+import queue
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+from random import Random
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .ph import packaging
+
+
+Num = Union[int, float]
+
+Job = namedtuple('Job', ('width', 'length', 'rectangles', 'sorting', 'strain', 'rounding'),
+                 defaults=('width', 1., None))
+JobResult = namedtuple('JobResult', ('index', 'result', 'error'))
+Start = namedtuple('Start', ('sorting', 'seed', 'score'))
+
+
+def get_rounding_func(rounding: Union[None, int, Callable[[Num], Num]]) -> Optional[Callable[[Num], Num]]:
+    """Функция округления по ее описанию
+
+    Целое число задает количество знаков после запятой. Лямбда-функции
+    нельзя передать в другой процесс, поэтому для пакетной упаковки
+    округление удобно задавать числом.
+    """
+    if rounding is None or callable(rounding):
+        return rounding
+    return partial(round, ndigits=rounding)
+
+
+def run_job(index: int, job: Job) -> JobResult:
+    """Упаковка одного задания с перехватом ошибок"""
+    try:
+        job = Job(*job)
+        result = packaging(job.width, job.length, job.rectangles, sorting=job.sorting,
+                           strain=job.strain, rounding_func=get_rounding_func(job.rounding))
+    except Exception as e:
+        return JobResult(index, None, e)
+    return JobResult(index, result, None)
+
+
+def _run_chunk(chunk: List[tuple]) -> List[JobResult]:
+    return [run_job(index, job) for index, job in chunk]
+
+
+def _submit(executor: ProcessPoolExecutor, fn: Callable, chunk: List[tuple], args: tuple):
+    """Передача пакета в пул, ошибка передачи возвращается вместо Future"""
+    try:
+        return executor.submit(fn, chunk, *args)
+    except Exception as e:  # например, BrokenProcessPool после аварии процесса
+        return e
+
+
+def _chunk_results(chunk: List[tuple], future) -> List[JobResult]:
+    """Результаты пакета или ошибка для каждого его задания"""
+    try:
+        if isinstance(future, Exception):
+            raise future
+        return future.result()
+    except Exception as e:  # задание нельзя передать через pickle, процесс аварийно завершился и т.п.
+        return [JobResult(index, None, e) for index, _ in chunk]
+
+
+def _map_chunks(fn: Callable, jobs: Iterable, workers: Optional[int], chunksize: int,
+                ordered: bool, *args) -> Iterator[JobResult]:
+    """Выполнение fn(chunk, *args) для пакетов заданий в пуле процессов
+
+    Задания нумеруются и делятся на пакеты по chunksize штук, fn
+    возвращает список JobResult пакета. Одновременно в пуле находится
+    не более 2 * workers пакетов, поэтому jobs читается по мере
+    выполнения. Ошибка передачи или выполнения пакета возвращается как
+    JobResult с ошибкой для каждого его задания и не прерывает остальные.
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be positive but {chunksize} was given.")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    numbered = enumerate(jobs)
+    chunks = iter(lambda: list(islice(numbered, chunksize)), [])
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from fn(chunk, *args)
+        return
+
+    limit = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if ordered:
+            queue: deque = deque()
+            for chunk in islice(chunks, limit):
+                queue.append((chunk, _submit(executor, fn, chunk, args)))
+            while queue:
+                chunk, future = queue.popleft()
+                yield from _chunk_results(chunk, future)
+                for chunk in islice(chunks, 1):
+                    queue.append((chunk, _submit(executor, fn, chunk, args)))
+            return
+
+        pending = {}
+        for chunk in chunks:
+            future = _submit(executor, fn, chunk, args)
+            if isinstance(future, Exception):
+                yield from _chunk_results(chunk, future)
+                continue
+            pending[future] = chunk
+            if len(pending) < limit:
+                continue
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield from _chunk_results(pending.pop(future), future)
+        for future in as_completed(pending):
+            yield from _chunk_results(pending[future], future)
+
+
+def packaging_many(jobs: Iterable[Job], workers: Optional[int]=None, chunksize: int=1,
+                   ordered: bool=True) -> Iterator[JobResult]:
+    """Пакетная упаковка независимых заданий в пуле процессов
+
+    Parameters
+    ----------
+    jobs : Iterable[Job]
+        Задания: кортежи (width, length, rectangles, sorting, strain, rounding),
+        последние три поля необязательны. rounding - количество знаков
+        после запятой или функция округления, доступная для pickle.
+    workers : Optional[int]
+        Количество процессов. По умолчанию os.cpu_count(). Если
+        workers=1, задания выполняются в текущем процессе.
+    chunksize : int, default=1
+        Количество заданий, передаваемых процессу за один раз.
+    ordered : bool, default=True
+        Возвращать результаты в порядке заданий (True) или по мере
+        готовности (False).
+
+    Returns
+    -------
+    results : Iterator[JobResult]
+        Результаты (index, result, error), где index - номер задания,
+        result - результат packaging, error - исключение, возникшее при
+        упаковке (result тогда None). Ошибка одного задания не прерывает
+        остальные, в том числе если задание нельзя передать в другой 
+        процесс. Задания читаются из jobs по мере выполнения.
+    """
+    return _map_chunks(_run_chunk, jobs, workers, chunksize, ordered)
+
+
+def perturb(rectangles, seed: Optional[Union[int, str]]):
+    """Случайная перестановка прямоугольников внутри каждого приоритета
+
+    Меняет порядок равных по размеру прямоугольников после сортировки.
+    Возвращает новый набор и перестановки, где perm[h][p][i] - исходный 
+    индекс i-го прямоугольника. Для seed=None набор не изменяется.
+    """
+    if seed is None:
+        return rectangles, None
+    rng = Random(seed)
+    new_rectangles, perm = {}, {}
+    for h, group in rectangles.items():
+        new_rectangles[h], perm[h] = {}, {}
+        for p, r_list in group.items():
+            order = list(range(len(r_list)))
+            rng.shuffle(order)
+            new_rectangles[h][p] = [r_list[i] for i in order]
+            perm[h][p] = order
+    return new_rectangles, perm
+
+
+def restore_indices(result, perm):
+    """Перевод индексов результата packaging к исходному набору"""
+    if perm is None:
+        return result
+    res, indices, length_marking, length = result
+    res = {h: {p: [r._replace(idx=perm[h][p][r.idx]) for r in list_r] for p, list_r in group.items()}
+           for h, group in res.items()}
+    indices = {h: {p: [perm[h][p][i] for i in idxs] for p, idxs in group.items()}
+               for h, group in indices.items()}
+    return res, indices, dict(length_marking), length
+
+
+def score(result, length: Num) -> Tuple[Num, Num]:
+    """Оценка результата: размещенная площадь и использованная длина
+
+    Чем меньше значение, тем лучше: сначала сравнивается площадь 
+    размещенных прямоугольников (со знаком минус), затем длина листа.
+    """
+    res, _, _, unused_length = result
+    placed = sum(r.w * r.l for group in res.values() for list_r in group.values() for r in list_r)
+    return -placed, length - unused_length
+
+
+def _run_start(width, length, rectangles, sorting, strain, rounding, seed):
+    perturbed, perm = perturb(rectangles, seed)
+    result = packaging(width, length, perturbed, sorting=sorting, strain=strain,
+                       rounding_func=get_rounding_func(rounding))
+    result = restore_indices(result, perm)
+    return result, score(result, length)
+
+
+def _put(finished: queue.Queue, k: int, ok: bool, value) -> None:
+    finished.put((k, ok, value))
+
+
+def packaging_multistart(width: Num, length: Num, rectangles, starts: int=8, seed: int=0,
+                         strain: Num=1., rounding: Union[None, int, Callable[[Num], Num]]=None,
+                         workers: Optional[int]=None, budget: Optional[float]=None):
+    """Многократный запуск packaging с возмущениями и выбор лучшего результата
+
+    Выполняются запуски с сортировкой по ширине и по длине без
+    возмущений и starts запусков со случайной перестановкой
+    прямоугольников внутри приоритетов (сортировки чередуются).
+    Лучшим считается результат с наибольшей размещенной площадью, а
+    при равенстве - с наименьшей использованной длиной; далее - 
+    запуск с меньшим номером. Для фиксированного seed результат не 
+    зависит от количества процессов, если не задан budget.
+
+    Parameters
+    ----------
+    width, length, rectangles, strain :
+        См. packaging.
+    starts : int, default=8
+        Количество запусков с возмущениями.
+    seed : int, default=0
+        Начальное значение генератора случайных чисел.
+    rounding : Union[None, int, Callable[[Num], Num]]
+        Количество знаков после запятой или функция округления.
+    workers : Optional[int]
+        Количество процессов, см. packaging_many.
+    budget : Optional[float]
+        Ограничение времени работы в секундах. Запуски, не завершившиеся 
+        к этому моменту, не учитываются, а процессы, в которых они 
+        выполняются, завершаются (Pool.terminate), так что после возврата 
+        не остается работающих процессов. Ограничение действует, только 
+        когда есть хотя бы один результат: первый завершившийся запуск 
+        всегда дожидается окончания, поэтому время работы может 
+        превысить budget на время одного запуска packaging.
+
+    Returns
+    -------
+    result : tuple
+        Результат packaging для лучшего запуска, индексы относятся к 
+        исходному набору rectangles.
+    start : Start
+        Параметры лучшего запуска (sorting, seed, score), seed=None 
+        для запуска без возмущений.
+    """
+    variants = [("width", None), ("length", None)]
+    variants += [(("width", "length")[i % 2], f'{seed}:{i}') for i in range(starts)]
+    deadline = None if budget is None else time.monotonic() + budget
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    done = {}
+    errors = []
+    if workers == 1:
+        for k, (sorting, s) in enumerate(variants):
+            if deadline is not None and time.monotonic() > deadline and done:
+                break
+            try:
+                done[k] = _run_start(width, length, rectangles, sorting, strain, rounding, s)
+            except Exception as e:
+                errors.append(e)
+    else:
+        # Pool, а не ProcessPoolExecutor: незавершенные запуски можно прервать terminate
+        finished: queue.Queue = queue.Queue()
+        pool = Pool(workers)
+        try:
+            for k, (sorting, s) in enumerate(variants):
+                pool.apply_async(_run_start, (width, length, rectangles, sorting, strain, rounding, s),
+                                 callback=partial(_put, finished, k, True),
+                                 error_callback=partial(_put, finished, k, False))
+            for _ in variants:
+                # пока нет ни одного результата, ожидание не ограничено
+                timeout = None if deadline is None or not done else max(0., deadline - time.monotonic())
+                try:
+                    k, ok, value = finished.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if ok:
+                    done[k] = value
+                else:
+                    errors.append(value)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    if not done:
+        raise errors[0]
+    k = min(done, key=lambda k: (done[k][1], k))
+    result, best_score = done[k]
+    return result, Start(variants[k][0], variants[k][1], best_score)
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+
+from .batch import get_rounding_func
+from .order import Order
+from .ph import packaging
+
+
+Num = Union[int, float]
+
+
+def canonical_order(rectangles):
+    """Канонический вид набора для ключа кэша
+
+    Прямоугольники поворачиваются так, чтобы ширина не превышала длину,
+    как это делает packaging, поэтому поворот не влияет на ключ. Порядок
+    толщин, приоритетов и прямоугольников сохраняется: порядок равных
+    прямоугольников после сортировки и порядок приоритетов влияют на
+    результат.
+    """
+    if isinstance(rectangles, Order):
+        rectangles = rectangles.to_dict()
+    return {h: {p: [(r[1], r[0]) if r[0] > r[1] else (r[0], r[1]) for r in r_list]
+                for p, r_list in group.items()}
+            for h, group in rectangles.items()}
+
+
+def copy_result(result):
+    """Копия результата packaging, изменение которой не затрагивает кэш"""
+    res, indices, length_marking, length = result
+    res = {h: {p: list(list_r) for p, list_r in group.items()} for h, group in res.items()}
+    indices = {h: {p: list(idxs) for p, idxs in group.items()} for h, group in indices.items()}
+    return res, indices, dict(length_marking), length
+
+
+def rounding_key(rounding: Union[None, int, Callable[[Num], Num]]) -> Optional[str]:
+    """Описание функции округления для ключа или None, если его нельзя получить"""
+    if rounding is None or isinstance(rounding, int):
+        return repr(rounding)
+    qualname = getattr(rounding, '__qualname__', '<')
+    if '<' in qualname:  # лямбда-функции и локальные функции не различимы по имени
+        return None
+    return f'{rounding.__module__}.{qualname}'
+
+
+class PackingCache:
+    """Кэш результатов packaging с ключом по содержимому заказа
+
+    Ключ - хэш SHA-256 от размеров листа, канонического вида набора
+    (см. canonical_order), сортировки, коэффициента strain и функции
+    округления. Заказы, отличающиеся только поворотом прямоугольников,
+    дают одинаковый ключ. Упаковывается набор в том виде, в котором он
+    передан, поэтому результат совпадает с результатом packaging с теми
+    же параметрами. Каждый вызов возвращает новую копию результата.
+
+    Результаты хранятся в памяти (LRU на maxsize записей) и, если задан
+    directory, в файлах на диске с вытеснением давно не использованных
+    файлов при превышении max_bytes.
+
+    Parameters
+    ----------
+    maxsize : int, default=128
+        Количество результатов в памяти.
+    directory : Optional[str]
+        Каталог для хранения результатов на диске.
+    max_bytes : Optional[int]
+        Ограничение суммарного размера файлов в directory.
+    """
+    def __init__(self, maxsize: int=128, directory: Optional[str]=None,
+                 max_bytes: Optional[int]=None) -> None:
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, width: Num, length: Num, canon, sorting: str, strain: Num,
+            rounding: Union[None, int, Callable[[Num], Num]]) -> Optional[str]:
+        r_key = rounding_key(rounding)
+        if r_key is None:
+            return None
+        groups = tuple((h, tuple((p, tuple(r_list)) for p, r_list in g.items())) for h, g in canon.items())
+        data = repr((width, length, groups, sorting, strain, r_key))
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def packaging(self, width: Num, length: Num, rectangles, sorting: str="width", strain: Num=1.,
+                  rounding: Union[None, int, Callable[[Num], Num]]=None):
+        """Результат packaging из кэша или новый расчет
+
+        Параметры и результат как у packaging, rounding - количество
+        знаков после запятой или функция округления. Для лямбда-функций
+        ключ не строится, и кэш не используется.
+        """
+        key = self.key(width, length, canonical_order(rectangles), sorting, strain, rounding)
+        result = None if key is None else self._get(key)
+        if result is None:
+            self.misses += 1
+            result = packaging(width, length, rectangles, sorting=sorting, strain=strain,
+                               rounding_func=get_rounding_func(rounding))
+            if key is not None:
+                self._put(key, result)
+        else:
+            self.hits += 1
+        return copy_result(result)
+
+    def clear(self) -> None:
+        """Очистка памяти и каталога кэша"""
+        self._memory.clear()
+        for path in self._files():
+            os.remove(path)
+
+    def _get(self, key: str):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if self.directory is None:
+            return None
+        path = os.path.join(self.directory, key + '.pickle')
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)  # время изменения используется для вытеснения
+        self._remember(key, result)
+        return result
+
+    def _put(self, key: str, result) -> None:
+        self._remember(key, result)
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, key + '.pickle')
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _remember(self, key: str, result) -> None:
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _files(self):
+        if self.directory is None:
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if name.endswith('.pickle')]
+
+    def _evict(self) -> None:
+        if self.max_bytes is None:
+            return
+        files = [(os.stat(path), path) for path in self._files()]
+        total = sum(st.st_size for st, _ in files)
+        for st, path in sorted(files, key=lambda x: x[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= st.st_size
@@ -0,0 +1,197 @@
+from array import array
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple, Union
+
+
+Num = Union[int, float]
+Area = Tuple[Num, Num, Num, Num]
+Split = Tuple[int, Num, Optional[Area]]
+
+# направление реза: X - рез вдоль длины на координате x, Y - рез поперек полосы на координате y
+X, Y = 0, 1
+NO_CUT = -1
+
+Cut = namedtuple('Cut', ('axis', 'position', 'start', 'end'))
+Strip = namedtuple('Strip', ('sheet', 'height', 'node'))
+
+
+def guillotine_split(x: Num, y: Num, w: Num, h: Num, omega: Num, d: Num,
+                     variant: int, min_side: Num) -> List[Split]:
+    """Резы области после размещения прямоугольника omega x d в ее углу (x, y)
+
+    Правило разрезания recursive_packing для вариантов размещения 1-4.
+    Возвращаются резы (axis, position, area) в порядке выполнения:
+    каждый следующий рез делит первую (нижнюю или левую) часть
+    предыдущего, и после последнего реза первая часть занята
+    прямоугольником. area - подобласть второй части, которая
+    заполняется дальше, или None, если часть уже меньше min_side и
+    остается отходом. Подобласти заполняются в обратном порядке, т.е.
+    при обходе через стек их нужно добавлять в порядке резов.
+
+    Examples
+    --------
+    >>> guillotine_split(0, 0, 10, 8, 4, 3, 4, 2)
+    [(0, 4, (4, 0, 6, 8)), (1, 3, (0, 3, 4, 5))]
+    """
+    if variant == 1:
+        return []
+    if variant == 2:
+        return [(Y, y + d, (x, y + d, w, h - d))]
+    if variant == 3:
+        return [(X, x + omega, (x + omega, y, w - omega, h))]
+    if w - omega < min_side or omega < min_side <= h - d:
+        # сначала рез поперек области, затем нижняя часть делится вдоль
+        right = (x + omega, y, w - omega, d) if w - omega >= min_side else None
+        return [(Y, y + d, (x, y + d, w, h - d)), (X, x + omega, right)]
+    # сначала рез вдоль области, затем левая часть делится поперек
+    top = (x, y + d, omega, h - d) if h - d >= min_side else None
+    return [(X, x + omega, (x + omega, y, w - omega, h)), (Y, y + d, top)]
+
+
+class CutTree:
+    """Дерево гильотинных резов, записываемое во время упаковки
+
+    Объект передается в packaging, phspprg, phsbpprg или
+    recursive_packing через параметр cuts. Каждая полоса (в phsbpprg -
+    весь лист) является корнем дерева. Узел - прямоугольная область,
+    которая либо разрезается одним резом на две дочерние области, либо
+    занята прямоугольником заказа, либо остается отходом.
+
+    Узлы хранятся в таблице из массивов array, одна строка на узел.
+    Дочерние узлы создаются парой, поэтому хранится только номер первого.
+    Узлы создаются в порядке работы алгоритма: рез родителя всегда
+    записан раньше резов дочерних областей, а узлы одной полосы идут
+    подряд. Поэтому список резов полосы получается просмотром ее узлов
+    по порядку, без обхода размещенных прямоугольников.
+
+    Attributes
+    ----------
+    strips : List[Strip]
+        Полосы в порядке упаковки: номер листа, толщина и корневой узел.
+    sheet, height :
+        Номер листа и толщина, которые записываются для новых полос.
+        Устанавливаются packaging_sheets и pack_sheet.
+
+    Examples
+    --------
+    >>> tree = CutTree()
+    >>> root = tree.open_strip(0, 0, 10, 4)
+    >>> piece, rest = tree.split(root, X, 6)
+    >>> tree.place(piece, 1, 0)
+    >>> tree.cut_list(0)
+    [Cut(axis='x', position=6.0, start=0.0, end=4.0)]
+    """
+    def __init__(self) -> None:
+        self.strips: List[Strip] = []
+        self.sheet = 0
+        self.height: Optional[Num] = None
+        self._starts: List[int] = []  # первый узел каждой полосы
+        self.parent = array('l')
+        self.child = array('l')
+        self.axis = array('b')
+        self.position = array('d')
+        self.x = array('d')
+        self.y = array('d')
+        self.w = array('d')
+        self.l = array('d')
+        self.priority = array('d')
+        self.idx = array('l')
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def open_strip(self, x: Num, y: Num, w: Num, l: Num) -> int:
+        """Новая полоса, возвращает ее корневой узел"""
+        node = self._add(-1, x, y, w, l)
+        self.strips.append(Strip(self.sheet, self.height, node))
+        self._starts.append(node)
+        return node
+
+    def split(self, node: int, axis: int, position: Num) -> Tuple[int, int]:
+        """Рез области node, возвращает области до и после реза"""
+        x, y, w, l = self.x[node], self.y[node], self.w[node], self.l[node]
+        self.axis[node] = axis
+        self.position[node] = position
+        if axis == X:
+            first = self._add(node, x, y, position - x, l)
+            self._add(node, position, y, x + w - position, l)
+        else:
+            first = self._add(node, x, y, w, position - y)
+            self._add(node, x, position, w, y + l - position)
+        self.child[node] = first
+        return first, first + 1
+
+    def place(self, node: int, priority: Num, idx: int) -> None:
+        """Область node занята прямоугольником idx группы priority"""
+        self.priority[node] = priority
+        self.idx[node] = idx
+
+    def record(self, node: int, splits: List[Split], priority: Num, idx: int) -> List[int]:
+        """Резы guillotine_split в области node и размещение прямоугольника
+
+        Возвращает узлы вторых частей в порядке резов, т.е. узлы
+        подобластей из splits.
+        """
+        rest = []
+        for axis, position, _ in splits:
+            node, second = self.split(node, axis, position)
+            rest.append(second)
+        self.place(node, priority, idx)
+        return rest
+
+    def truncate(self, size: int) -> None:
+        """Удаление узлов, начиная с size, и полос, начинающихся с них
+
+        Используется, когда результат упаковки отбрасывается (переход
+        от phspprg к phsbpprg в packaging). Рез узла, дочерние области
+        которого удалены, тоже отменяется.
+        """
+        for node in range(size, len(self)):
+            parent = self.parent[node]
+            if 0 <= parent < size:
+                self.axis[parent], self.child[parent] = NO_CUT, -1
+        for column in (self.parent, self.child, self.axis, self.position, self.x, self.y,
+                       self.w, self.l, self.priority, self.idx):
+            del column[size:]
+        while self._starts and self._starts[-1] >= size:
+            self._starts.pop()
+            self.strips.pop()
+
+    def cut_list(self, strip: int) -> List[Cut]:
+        """Резы полосы в порядке выполнения
+
+        Рез по оси 'x' проходит на координате x = position от y = start
+        до y = end, по оси 'y' - на координате y = position от x = start
+        до x = end. Резы, отделяющие область нулевого размера, пропускаются.
+        """
+        start = self._starts[strip]
+        stop = self._starts[strip + 1] if strip + 1 < len(self._starts) else len(self)
+        cuts = []
+        for node in range(start, stop):
+            axis = self.axis[node]
+            if axis == NO_CUT:
+                continue
+            first = self.child[node]
+            if axis == X:
+                if self.w[first] and self.w[first + 1]:
+                    cuts.append(Cut('x', self.position[node], self.y[node], self.y[node] + self.l[node]))
+            elif self.l[first] and self.l[first + 1]:
+                cuts.append(Cut('y', self.position[node], self.x[node], self.x[node] + self.w[node]))
+        return cuts
+
+    def cut_lists(self) -> Dict[int, List[Cut]]:
+        """Резы всех полос, ключ - номер полосы в strips"""
+        return {s: self.cut_list(s) for s in range(len(self.strips))}
+
+    def _add(self, parent: int, x: Num, y: Num, w: Num, l: Num) -> int:
+        self.parent.append(parent)
+        self.child.append(-1)
+        self.axis.append(NO_CUT)
+        self.position.append(0.)
+        self.x.append(x)
+        self.y.append(y)
+        self.w.append(w)
+        self.l.append(l)
+        self.priority.append(float('nan'))
+        self.idx.append(-1)
+        return len(self.parent) - 1
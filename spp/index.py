@@ -0,0 +1,376 @@
+from bisect import bisect_right
+from heapq import heapify, heappop, heappush
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+Num = Union[int, float]
+RectType = Tuple[Num, Num]
+
+INF = float('inf')
+
+# условия (ширина, длина) для вариантов 1-4 функции get_best_fig
+VARIANTS = ((1, (True, True)), (2, (True, False)), (3, (False, True)), (4, (False, False)))
+
+
+class PieceIndex:
+    """Индекс оставшихся прямоугольников одной группы приоритета
+
+    Заменяет список индексов группы: сохраняет порядок перебора, 
+    поддерживает удаление первого элемента и удаление по индексу за 
+    O(1) и O(log n) соответственно, а также добавление в конец.
+
+    Позиция прямоугольника в индексе совпадает с его позицией в списке
+    индексов, по которому выполняется перебор в get_best_fig. Список
+    должен быть отсортирован по невозрастанию размера key, поэтому
+    условия на этот размер задают непрерывный диапазон позиций, который
+    находится бинарным поиском. По второму размеру строится дерево
+    отрезков минимумов (условие "меньше") и корзины равных значений
+    (условие "равно"), в которых первый оставшийся элемент ищется через
+    систему непересекающихся множеств.
+
+    Точные совпадения (варианты 1-3 get_best_fig) находятся по хэшу:
+    диапазон позиций с заданным первым размером и корзины по паре
+    размеров и по второму размеру хранятся в словарях, так что для
+    отсутствующих размеров поиск завершается за O(1), а вариант 1 -
+    без бинарного поиска и обхода дерева.
+
+    Добавленные через append элементы хранятся в конце и не участвуют
+    в поиске best_fit до пересортировки (см. sort_rectangles).
+
+    Parameters
+    ----------
+    ids : Sequence[int]
+        Индексы прямоугольников в порядке перебора.
+    rectangles : Sequence[Tuple[Num, Num]]
+        Список прямоугольников группы.
+    key : int, {0, 1}
+        Размер, по которому отсортированы ids: 0 - ширина, 1 - длина.
+
+    Attributes
+    ----------
+    probes : int
+        Количество обращений к словарям корзин и диапазонов и узлов 
+        дерева отрезков, просмотренных best_fit. Аналог количества 
+        прямоугольников, просмотренных get_best_fig.
+    """
+    def __init__(self, ids: Sequence[int], rectangles: Sequence[RectType], key: int=0) -> None:
+        self.key = key
+        self.rectangles = rectangles
+        self.pending: List[int] = []
+        self.probes = 0
+        self._ids = list(ids)
+        self._pos = {idx: p for p, idx in enumerate(self._ids)}
+        self._alive = [True] * len(self._ids)
+        self._count = len(self._ids)
+        self._head = 0
+        self._last = len(self._ids) - 1
+
+        # ключи записаны со знаком минус, чтобы списки были возрастающими
+        self._neg_k1 = [-rectangles[idx][key] for idx in self._ids]
+        k2 = [rectangles[idx][1 - key] for idx in self._ids]
+
+        size = 1
+        while size < len(k2):
+            size *= 2
+        self._size = size
+        self._tree = [INF] * (2 * size)
+        self._tree[size:size + len(k2)] = k2
+        for i in range(size - 1, 0, -1):
+            self._tree[i] = min(self._tree[2 * i], self._tree[2 * i + 1])
+
+        # диапазоны позиций с равным первым размером
+        self._ranges: Dict[Num, Tuple[int, int]] = {}
+        for p, v in enumerate(self._neg_k1):
+            lo, _ = self._ranges.get(-v, (p, p))
+            self._ranges[-v] = (lo, p + 1)
+
+        # корзины по второму размеру: позиции, первый размер, ссылки на следующий элемент
+        self._buckets: Dict[Num, Tuple[List[int], List[Num], List[int]]] = {}
+        self._place: List[Tuple[Num, int]] = []
+        # корзины по паре размеров: позиции и ссылки на следующий элемент
+        self._pairs: Dict[RectType, Tuple[List[int], List[int]]] = {}
+        self._pair_place: List[Tuple[RectType, int]] = []
+        for p, v in enumerate(k2):
+            if v not in self._buckets:
+                self._buckets[v] = ([], [], [])
+            positions, neg_k1, _ = self._buckets[v]
+            self._place.append((v, len(positions)))
+            positions.append(p)
+            neg_k1.append(self._neg_k1[p])
+
+            pair = (-self._neg_k1[p], v)
+            if pair not in self._pairs:
+                self._pairs[pair] = ([], [])
+            positions, _ = self._pairs[pair]
+            self._pair_place.append((pair, len(positions)))
+            positions.append(p)
+        for positions, _, parent in self._buckets.values():
+            parent.extend(range(len(positions) + 1))
+        for positions, parent in self._pairs.values():
+            parent.extend(range(len(positions) + 1))
+
+        # куча меньших сторон с ленивым удалением
+        self._sides = [(min(rectangles[idx]), idx) for idx in self._ids]
+        heapify(self._sides)
+
+    def __len__(self) -> int:
+        return self._count + len(self.pending)
+
+    def __iter__(self) -> Iterator[int]:
+        for p, idx in enumerate(self._ids):
+            if self._alive[p]:
+                yield idx
+        yield from self.pending
+
+    def __contains__(self, idx: object) -> bool:
+        p = self._pos.get(idx)  # type: ignore
+        return (p is not None and self._alive[p]) or idx in self.pending
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({list(self)!r})'
+
+    def append(self, idx: int) -> None:
+        """Возврат прямоугольника в конец порядка перебора"""
+        self.pending.append(idx)
+        heappush(self._sides, (min(self.rectangles[idx]), idx))
+
+    def pop(self, index: int=-1) -> int:
+        """Удаление и возврат элемента, первого (0) или последнего (-1) за O(1)"""
+        if not len(self):
+            raise IndexError('pop from empty PieceIndex')
+        if index == 0 and self._count:
+            while not self._alive[self._head]:
+                self._head += 1
+            idx = self._ids[self._head]
+        elif index == -1 and self.pending:
+            return self.pending.pop()
+        elif index == -1:
+            while not self._alive[self._last]:
+                self._last -= 1
+            idx = self._ids[self._last]
+        else:
+            idx = list(self)[index]
+        self.remove(idx)
+        return idx
+
+    def remove(self, idx: int) -> None:
+        """Удаление прямоугольника по индексу"""
+        p = self._pos.get(idx)
+        if p is None or not self._alive[p]:
+            self.pending.remove(idx)
+            return
+        self._alive[p] = False
+        self._count -= 1
+
+        i = p + self._size
+        self._tree[i] = INF
+        while i > 1:
+            i >>= 1
+            self._tree[i] = min(self._tree[2 * i], self._tree[2 * i + 1])
+
+        v, j = self._place[p]
+        self._buckets[v][2][j] = j + 1
+        pair, j = self._pair_place[p]
+        self._pairs[pair][1][j] = j + 1
+
+    def min_side(self) -> Num:
+        """Наименьшая сторона оставшихся прямоугольников (inf, если их нет)"""
+        sides = self._sides
+        while sides and sides[0][1] not in self:
+            heappop(sides)
+        return sides[0][0] if sides else INF
+
+    def best_fit(self, w: Num, l: Num, D: int) -> Tuple[int, Optional[int], Optional[int]]:
+        """Поиск лучшего прямоугольника для области w x l
+
+        Результат совпадает с результатом get_best_fig для того же
+        порядка индексов: наименьший вариант размещения, а среди
+        равных - первый в порядке перебора (индекс, затем ориентация).
+        """
+        if not self._count:
+            return 6, None, None
+        orientations = range(min(D, 1) + 1)
+        for variant, (eq_w, eq_l) in VARIANTS:
+            best: Optional[Tuple[int, int]] = None
+            for j in orientations:
+                if j % 2 == self.key:
+                    p = self._first(eq_w, w, eq_l, l)
+                else:
+                    p = self._first(eq_l, l, eq_w, w)
+                if p is not None and (best is None or p < best[0]):
+                    best = (p, j)
+            if best is not None:
+                return variant, best[1], self._ids[best[0]]
+        return 5, 0, self._ids[self._first_less(0, len(self._ids), INF)]
+
+    def _first(self, eq1: bool, v1: Num, eq2: bool, v2: Num) -> Optional[int]:
+        """Первая оставшаяся позиция с условиями на первый (v1) и второй (v2) размеры"""
+        self.probes += 1
+        if eq1 and eq2:
+            pair = self._pairs.get((v1, v2))
+            if pair is None:
+                return None
+            positions, parent = pair
+            j = _find(parent, 0)
+            return positions[j] if j < len(positions) else None
+        if eq2:
+            bucket = self._buckets.get(v2)
+            if bucket is None:
+                return None
+            positions, neg_k1, parent = bucket
+            j = _find(parent, bisect_right(neg_k1, -v1))
+            return positions[j] if j < len(positions) else None
+        if eq1:
+            if v1 not in self._ranges:
+                return None
+            lo, hi = self._ranges[v1]
+        else:
+            lo, hi = bisect_right(self._neg_k1, -v1), len(self._ids)
+        p = self._first_less(lo, hi, v2)
+        return p if p >= 0 else None
+
+    def _first_less(self, lo: int, hi: int, bound: Num) -> int:
+        """Первая позиция из [lo, hi), у которой второй размер меньше bound"""
+        tree, size = self._tree, self._size
+        left, right = [], []
+        lo += size
+        hi += size
+        while lo < hi:
+            if lo & 1:
+                left.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right.append(hi)
+            lo >>= 1
+            hi >>= 1
+        visited = 0
+        for node in left + right[::-1]:
+            visited += 1
+            if tree[node] < bound:
+                while node < size:
+                    visited += 1
+                    node *= 2
+                    if not tree[node] < bound:
+                        node += 1
+                self.probes += visited
+                return node - size
+        self.probes += visited
+        return -1
+
+
+def _find(parent: List[int], i: int) -> int:
+    """Следующий не удаленный элемент корзины (со сжатием путей)"""
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+class TypeIndex(PieceIndex):
+    """Индекс группы, в котором одинаковые прямоугольники объединены в типы
+
+    Поиск best_fit выполняется по одному представителю каждого типа
+    (различного размера) с учетом количества оставшихся копий, поэтому
+    дерево отрезков и корзины строятся по типам, а удаление копии
+    изменяет их, только когда тип заканчивается. Возвращается первая
+    оставшаяся копия найденного типа.
+
+    Порядок перебора типов задается первой копией каждого типа в ids.
+    Он совпадает с порядком PieceIndex, пока копии одного типа идут в
+    ids подряд; иначе при равенстве вариантов тип с более ранней
+    первой копией выбирается до исчерпания всех своих копий.
+
+    Используется вместо PieceIndex при packaging(..., item_types=True).
+
+    Parameters
+    ----------
+    ids, rectangles, key :
+        См. PieceIndex.
+    """
+    def __init__(self, ids: Sequence[int], rectangles: Sequence[RectType], key: int=0) -> None:
+        ids = list(ids)
+        copies: Dict[RectType, List[int]] = {}
+        for idx in ids:
+            r = rectangles[idx]
+            copies.setdefault((r[0], r[1]), []).append(idx)  # списки из JSON не хэшируются
+        super().__init__([c[0] for c in copies.values()], rectangles, key)
+
+        self._copies = {c[0]: c for c in copies.values()}  # представитель -> копии
+        self._next = dict.fromkeys(self._copies, 0)  # первая, возможно, оставшаяся копия
+        self._left = {rep: len(c) for rep, c in self._copies.items()}
+        self._type = {idx: c[0] for c in copies.values() for idx in c}
+        self._all = ids
+        self._all_pos = {idx: p for p, idx in enumerate(ids)}
+        self._all_alive = [True] * len(ids)
+        self._total = len(ids)
+        self._all_head = 0
+        self._all_last = len(ids) - 1
+
+    def __len__(self) -> int:
+        return self._total + len(self.pending)
+
+    def __iter__(self) -> Iterator[int]:
+        for p, idx in enumerate(self._all):
+            if self._all_alive[p]:
+                yield idx
+        yield from self.pending
+
+    def __contains__(self, idx: object) -> bool:
+        p = self._all_pos.get(idx)  # type: ignore
+        return (p is not None and self._all_alive[p]) or idx in self.pending
+
+    def pop(self, index: int=-1) -> int:
+        """Удаление и возврат элемента, первого (0) или последнего (-1) за O(1)"""
+        if not len(self):
+            raise IndexError('pop from empty TypeIndex')
+        if index == 0 and self._total:
+            while not self._all_alive[self._all_head]:
+                self._all_head += 1
+            idx = self._all[self._all_head]
+        elif index == -1 and self.pending:
+            return self.pending.pop()
+        elif index == -1:
+            while not self._all_alive[self._all_last]:
+                self._all_last -= 1
+            idx = self._all[self._all_last]
+        else:
+            idx = list(self)[index]
+        self.remove(idx)
+        return idx
+
+    def remove(self, idx: int) -> None:
+        """Удаление прямоугольника по индексу, тип удаляется вместе с последней копией"""
+        p = self._all_pos.get(idx)
+        if p is None or not self._all_alive[p]:
+            self.pending.remove(idx)
+            return
+        self._all_alive[p] = False
+        self._total -= 1
+        rep = self._type[idx]
+        self._left[rep] -= 1
+        if not self._left[rep]:
+            super().remove(rep)
+
+    def min_side(self) -> Num:
+        """Наименьшая сторона оставшихся прямоугольников (inf, если их нет)"""
+        sides = self._sides
+        while sides and not (self._left.get(sides[0][1]) or sides[0][1] in self.pending):
+            heappop(sides)
+        return sides[0][0] if sides else INF
+
+    def best_fit(self, w: Num, l: Num, D: int) -> Tuple[int, Optional[int], Optional[int]]:
+        """Поиск лучшего прямоугольника для области w x l, см. PieceIndex.best_fit"""
+        variant, orientation, rep = super().best_fit(w, l, D)
+        if rep is None:
+            return variant, orientation, rep
+        return variant, orientation, self._first_copy(rep)
+
+    def _first_copy(self, rep: int) -> int:
+        copies, i = self._copies[rep], self._next[rep]
+        while not self._all_alive[self._all_pos[copies[i]]]:
+            i += 1
+        self._next[rep] = i
+        return copies[i]
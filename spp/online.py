@@ -0,0 +1,123 @@
+import sys
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Tuple, Union
+
+from .cuts import Area, guillotine_split
+from .ph import get_best_fig
+from .rectangle import Rectangle
+
+
+Num = Union[int, float]
+RectType = Tuple[Num, Num]
+
+Placement = namedtuple('Placement', ('height', 'priority', 'rect'))
+
+
+class OnlinePacker:
+    """Упаковка прямоугольников по мере их поступления
+
+    Для каждой толщины открыта одна полоса, как в phspprg: первый
+    прямоугольник полосы кладется вдоль ширины листа, а свободные
+    подобласти справа от него заполняются следующими прямоугольниками
+    по правилам recursive_packing. Прямоугольник, который не помещается
+    ни в одну свободную подобласть, открывает новую полосу, а старая
+    закрывается. Поэтому хранятся только подобласти открытой полосы.
+
+    В отличие от packaging, будущие прямоугольники неизвестны: порядок
+    приоритетов не учитывается, а вместо наименьшей стороны оставшихся
+    прямоугольников при разрезании используется наименьшая сторона
+    уже поступивших.
+
+    Parameters
+    ----------
+    width : Num
+        Ширина листа.
+
+    Examples
+    --------
+    >>> packer = OnlinePacker(10)
+    >>> packer.feed(3.0, 1, (4, 10))
+    Placement(height=3.0, priority=1, rect=Rectangle(x=0, y=0, w=10, l=4, idx=0))
+    >>> packer.feed(3.0, 1, (5, 2))
+    Placement(height=3.0, priority=1, rect=Rectangle(x=0, y=4, w=5, l=2, idx=1))
+    >>> packer.lengths
+    {3.0: 6}
+    """
+    def __init__(self, width: Num) -> None:
+        self.width = width
+        self.lengths: Dict[Num, Num] = {}  # длина, занятая полосами каждой толщины
+        self.counts: MutableMapping[Num, Dict[Num, int]] = {}  # индексы в группах
+        self.min_side: Num = sys.maxsize
+        self._areas: Dict[Num, List[Area]] = {}  # свободные подобласти открытых полос
+
+    def feed(self, height: Num, priority: Num, rect: RectType) -> Placement:
+        """Размещение очередного прямоугольника"""
+        r = (rect[1], rect[0]) if rect[0] > rect[1] else tuple(rect)
+        group = self.counts.setdefault(height, {})
+        idx = group.get(priority, 0)
+        group[priority] = idx + 1
+        self.min_side = min(self.min_side, r[0])
+
+        areas = self._areas.setdefault(height, [])
+        best_variant, best_area, best_orientation = 5, None, None
+        for i, (x, y, w, h) in enumerate(areas):
+            variant, orientation, _ = get_best_fig(w, h, 1, [0], [r])
+            if variant < best_variant:
+                best_variant, best_area, best_orientation = variant, i, orientation
+                if variant == 1:
+                    break
+
+        if best_area is None:
+            placed = self._open_strip(height, r, idx)
+        else:
+            x, y, w, h = areas.pop(best_area)
+            omega, d = (r[0], r[1]) if best_orientation == 0 else (r[1], r[0])
+            placed = Rectangle(x, y, omega, d, idx)
+            areas[best_area:best_area] = split_area(x, y, w, h, omega, d, best_variant, self.min_side)
+        return Placement(height, priority, placed)
+
+    def _open_strip(self, height: Num, r: RectType, idx: int) -> Rectangle:
+        """Новая полоса, первый прямоугольник кладется как в phspprg"""
+        L = self.lengths.get(height, 0)
+        if r[1] > self.width:
+            placed = Rectangle(0, L, r[0], r[1], idx)
+        else:
+            placed = Rectangle(0, L, r[1], r[0], idx)
+        self.lengths[height] = L + placed.l
+        self._areas[height] = [(placed.w, L, self.width - placed.w, placed.l)]
+        return placed
+
+
+def split_area(x: Num, y: Num, w: Num, h: Num, omega: Num, d: Num,
+               variant: int, min_side: Num) -> List[Area]:
+    """Свободные подобласти после размещения прямоугольника omega x d
+
+    Разрезание выполняется по guillotine_split, как в recursive_packing, 
+    подобласти возвращаются в порядке заполнения.
+    """
+    splits = guillotine_split(x, y, w, h, omega, d, variant, min_side)
+    return [area for _, _, area in reversed(splits) if area is not None]
+
+
+def packaging_online(width: Num, pieces: Iterable[Tuple[Num, Num, RectType]]) -> Iterator[Placement]:
+    """Потоковая упаковка прямоугольников
+
+    Parameters
+    ----------
+    width : Num
+        Ширина листа.
+    pieces : Iterable[Tuple[Num, Num, Tuple[Num, Num]]]
+        Поступающие прямоугольники: толщина, приоритет и размеры.
+        Индекс idx результата - номер прямоугольника среди поступивших
+        с той же толщиной и приоритетом.
+
+    Returns
+    -------
+    placements : Iterator[Placement]
+        Размещения (толщина, приоритет, Rectangle) сразу после
+        поступления каждого прямоугольника. Координата y отсчитывается
+        от начала полосы соответствующей толщины.
+    """
+    packer = OnlinePacker(width)
+    for height, priority, rect in pieces:
+        yield packer.feed(height, priority, rect)
@@ -0,0 +1,230 @@
+from typing import Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple, Union
+
+import numpy as np
+
+
+Num = Union[int, float]
+RectType = Tuple[Num, Num]
+Group = MutableMapping[Num, List[RectType]]
+DictGroup = MutableMapping[Num, Group]
+DictGroupIdx = MutableMapping[Num, MutableMapping[Num, List[int]]]
+
+
+class Order:
+    """Колоночное представление набора прямоугольников
+
+    Прямоугольники хранятся в массивах NumPy, строки одной группы
+    (толщина, приоритет) расположены подряд в порядке вложенного
+    словаря. Столбец idx хранит индекс прямоугольника в списке его
+    группы, т.е. то же значение, что и Rectangle.idx.
+
+    Каждый столбец имеет один тип, поэтому при смешении целых и
+    вещественных размеров to_dict возвращает вещественные числа.
+
+    Order - формат ввода, вывода и предварительной обработки заказа.
+    Функции для вложенных словарей (area, items_by_index,
+    scaling_all_group) передают ему только аргументы типа Order, а
+    словари обрабатывают как прежде. При упаковке поворот и сортировка
+    выполняются по столбцам, но алгоритм работает со словарем списков и
+    индексами PieceIndex, которые строятся из него (см. prepare).
+
+    Parameters
+    ----------
+    idx, thickness, priority, width, length : numpy.ndarray
+        Столбцы одинаковой длины.
+    offsets : Dict[Tuple[Num, Num], Tuple[int, int]]
+        Границы строк каждой группы (толщина, приоритет), порядок
+        ключей соответствует порядку групп.
+
+    Examples
+    --------
+    >>> order = Order.from_dict({3.0: {1: [(2, 3), (5, 5)]}, 2.0: {1: [(10, 10)], 2: []}})
+    >>> len(order)
+    3
+    >>> order.area()
+    {3.0: 31.0, 2.0: 100.0}
+    >>> order.scaled().to_dict()
+    {3.0: {1: [(2, 3.0), (5, 5.0)]}, 2.0: {1: [(10, 6.666666666666667)], 2: []}}
+    """
+    def __init__(self, idx: np.ndarray, thickness: np.ndarray, priority: np.ndarray,
+                 width: np.ndarray, length: np.ndarray,
+                 offsets: Dict[Tuple[Num, Num], Tuple[int, int]]) -> None:
+        self.idx = idx
+        self.thickness = thickness
+        self.priority = priority
+        self.width = width
+        self.length = length
+        self.offsets = offsets
+
+    @classmethod
+    def from_dict(cls, rectangles: DictGroup) -> 'Order':
+        """Построение из вложенного словаря толщина -> приоритет -> список"""
+        idx: List[int] = []
+        thickness: List[Num] = []
+        priority: List[Num] = []
+        width: List[Num] = []
+        length: List[Num] = []
+        offsets = {}
+        for h, group in rectangles.items():
+            for p, r_list in group.items():
+                start = len(idx)
+                n = len(r_list)
+                idx.extend(range(n))
+                thickness.extend([h] * n)
+                priority.extend([p] * n)
+                width.extend([r[0] for r in r_list])
+                length.extend([r[1] for r in r_list])
+                offsets[h, p] = (start, start + n)
+        return cls(np.array(idx, dtype=np.intp), np.array(thickness, dtype=float),
+                   np.array(priority), np.array(width), np.array(length), offsets)
+
+    @classmethod
+    def from_columns(cls, thickness: np.ndarray, priority: np.ndarray,
+                     width: np.ndarray, length: np.ndarray) -> 'Order':
+        """Построение из столбцов со строками в произвольном порядке
+
+        Группы упорядочиваются так же, как при последовательном
+        добавлении строк во вложенный словарь: толщины в порядке
+        первого появления, приоритеты внутри толщины - тоже. Порядок
+        строк внутри группы сохраняется.
+        """
+        thickness = np.asarray(thickness, dtype=float)
+        priority, width, length = np.asarray(priority), np.asarray(width), np.asarray(length)
+        if not len(thickness):
+            empty = np.zeros(0, dtype=np.intp)
+            return cls(empty, thickness, priority, width, length, {})
+
+        t_unique, t_first, t_inv = np.unique(thickness, return_index=True, return_inverse=True)
+        p_unique, p_inv = np.unique(priority, return_inverse=True)
+        g_unique, g_first, g_inv = np.unique(t_inv * len(p_unique) + p_inv,
+                                             return_index=True, return_inverse=True)
+        order = np.lexsort((g_first, t_first[g_unique // len(p_unique)]))
+        rank = np.empty(len(g_unique), dtype=np.intp)
+        rank[order] = np.arange(len(g_unique))
+        codes = rank[g_inv]
+
+        perm = np.argsort(codes, kind='stable')
+        stops = np.cumsum(np.bincount(codes, minlength=len(g_unique)))
+        starts = stops - np.bincount(codes, minlength=len(g_unique))
+        idx = np.arange(len(codes)) - starts[codes[perm]]
+        offsets = {}
+        for g in order.tolist():
+            h, p = t_unique[g_unique[g] // len(p_unique)].item(), p_unique[g_unique[g] % len(p_unique)].item()
+            offsets[h, p] = (int(starts[rank[g]]), int(stops[rank[g]]))
+        return cls(idx, thickness[perm], priority[perm], width[perm], length[perm], offsets)
+
+    def to_dict(self) -> DictGroup:
+        """Преобразование во вложенный словарь толщина -> приоритет -> список"""
+        width, length = self.width.tolist(), self.length.tolist()
+        d: DictGroup = {}
+        for (h, p), (start, stop) in self.offsets.items():
+            if h not in d:
+                d[h] = {}
+            d[h][p] = list(zip(width[start:stop], length[start:stop]))
+        return d
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    def groups(self) -> Iterator[Tuple[Num, Num, slice]]:
+        """Перебор групп: толщина, приоритет и срез строк группы"""
+        for (h, p), (start, stop) in self.offsets.items():
+            yield h, p, slice(start, stop)
+
+    def _with(self, width: np.ndarray, length: np.ndarray) -> 'Order':
+        return Order(self.idx, self.thickness, self.priority, width, length, self.offsets)
+
+    def canonical(self) -> 'Order':
+        """Поворот прямоугольников так, чтобы ширина не превышала длину"""
+        return self._with(np.minimum(self.width, self.length), np.maximum(self.width, self.length))
+
+    def scaled(self, strain: Num=1., h1: Optional[Num]=None,
+               rounding_func: Optional[Callable[[Num], Num]]=None) -> 'Order':
+        """Масштабирование длины, аналог scaling_all_group
+
+        Строки толщины h1 не изменяются. Функция округления
+        применяется только к измененным строкам, встроенная round
+        заменяется векторной, см. support.vectorize_rounding.
+        """
+        if h1 is None:
+            h1 = max(h for h, _ in self.offsets)
+        changed = self.thickness != h1
+        length = self.length.astype(float)
+        new_length = strain * (self.thickness[changed] * length[changed] / h1)
+        if rounding_func is not None:
+            from .support import vectorize_rounding  # support импортирует order
+            new_length = vectorize_rounding(rounding_func)(new_length)
+        length[changed] = new_length
+        return self._with(self.width, length)
+
+    def area(self) -> Dict[Num, float]:
+        """Суммарная площадь прямоугольников каждой толщины"""
+        keys = list(dict.fromkeys(h for h, _ in self.offsets))
+        unique = np.unique(np.array(keys, dtype=float))
+        sums = np.bincount(np.searchsorted(unique, self.thickness),
+                           weights=self.width * self.length, minlength=len(unique))
+        return {h: float(sums[np.searchsorted(unique, h)]) for h in keys}
+
+    def mask(self, indices: DictGroupIdx) -> np.ndarray:
+        """Булева маска строк, индексы которых указаны в indices"""
+        mask = np.zeros(len(self), dtype=bool)
+        for h, group in indices.items():
+            for p, ids in group.items():
+                start, _ = self.offsets[h, p]
+                mask[start + np.fromiter(ids, dtype=np.intp)] = True
+        return mask
+
+    def take(self, mask: np.ndarray) -> 'Order':
+        """Выборка строк по булевой маске с сохранением всех групп"""
+        counts = np.concatenate(([0], np.cumsum(mask)))
+        offsets = {}
+        for key, (start, stop) in self.offsets.items():
+            offsets[key] = (int(counts[start]), int(counts[stop]))
+        return Order(self.idx[mask], self.thickness[mask], self.priority[mask],
+                     self.width[mask], self.length[mask], offsets)
+
+    def select(self, indices: DictGroupIdx) -> 'Order':
+        """Выборка строк по индексам, сгруппированным по толщине и приоритету
+
+        Группы следуют в порядке indices, строки внутри группы - в
+        исходном порядке, как в items_by_index.
+        """
+        rows: List[np.ndarray] = []
+        offsets = {}
+        size = 0
+        for h, group in indices.items():
+            for p, ids in group.items():
+                start, stop = self.offsets[h, p]
+                mask = np.zeros(stop - start, dtype=bool)
+                mask[np.fromiter(ids, dtype=np.intp)] = True
+                selected = np.flatnonzero(mask) + start
+                rows.append(selected)
+                offsets[h, p] = (size, size + len(selected))
+                size += len(selected)
+        take = np.concatenate(rows) if rows else np.zeros(0, dtype=np.intp)
+        return Order(self.idx[take], self.thickness[take], self.priority[take],
+                     self.width[take], self.length[take], offsets)
+
+    def partition(self, indices: DictGroupIdx) -> Tuple['Order', 'Order']:
+        """Разбиение на строки, указанные в indices, и остальные
+
+        Обе части сохраняют все группы исходного набора.
+        """
+        mask = self.mask(indices)
+        return self.take(mask), self.take(~mask)
+
+    def sort_indices(self, sorting: str) -> DictGroupIdx:
+        """Индексы групп, отсортированные по невозрастанию ширины или длины
+
+        Порядок совпадает с порядком, который дает sort_rectangles для
+        канонического (повернутого) набора.
+        """
+        if sorting not in ["width", "length"]:
+            raise ValueError(f"The algorithm only supports sorting by width or length but {sorting} was given.")
+        column = self.width if sorting == "width" else self.length
+        indices: DictGroupIdx = {}
+        for h, p, rows in self.groups():
+            if h not in indices:
+                indices[h] = {}
+            indices[h][p] = np.argsort(-column[rows], kind='stable').tolist()
+        return indices
@@ -1,10 +1,16 @@
 import sys
-from copy import deepcopy
+from collections import namedtuple
+from contextlib import nullcontext
+from functools import partial
 from itertools import product
-from typing import Callable, List, MutableMapping, Optional, Tuple, Union, Dict
+from typing import Callable, Iterable, List, MutableMapping, Optional, Tuple, Union, Dict
 
 from .support import deformation, back_deformation
 from .rectangle import Rectangle
+from .index import PieceIndex, TypeIndex
+from .order import Order
+from .stats import PackingStats
+from .cuts import CutTree, X, guillotine_split
 
 
 Num = Union[int, float]
@@ -12,15 +18,28 @@ ListNum = List[Num]
 RectType = Tuple[Num, Num]
 Group = MutableMapping[Num, List[RectType]]
 DictGroup = MutableMapping[Num, Group]
-GroupIdx = MutableMapping[Num, List[int]]
+GroupIdx = MutableMapping[Num, Union[PieceIndex, List[int]]]
 DictGroupIdx = MutableMapping[Num, GroupIdx]
 ResGroup = MutableMapping[Num, List[Rectangle]]
 ResDictGroup = MutableMapping[Num, ResGroup]
 
+Sheet = namedtuple('Sheet', ('width', 'length', 'res', 'length_marking', 'length_left'))
+
+# через сколько размещений recursive_packing вызывает progress
+PROGRESS_STEP = 100
+
+# округление длины листа при переводе между толщинами в pack_sheet
+_round_1 = partial(round, ndigits=1)
+_round_4 = partial(round, ndigits=4)
+
     
-def packaging(width: Num, length: Num, rectangles: DictGroup, 
+def packaging(width: Num, length: Num, rectangles: Union[DictGroup, Order], 
               sorting: str="width", strain: Num=1., 
-              rounding_func: Optional[Callable[[Num], Num]]=None) -> Tuple[ResDictGroup, DictGroupIdx, Dict[Num, Num], Num]:
+              rounding_func: Optional[Callable[[Num], Num]]=None, 
+              stats: Optional[PackingStats]=None, 
+              item_types: bool=False, 
+              cuts: Optional[CutTree]=None, 
+              progress: Optional[Callable[[Num, int], None]]=None) -> Tuple[ResDictGroup, DictGroupIdx, Dict[Num, Num], Num]:
     """Функция двумерной упаковки прямоугольников
 
     Алгоритм учитывает приоритета детали, толщину и возможность 
@@ -35,7 +54,8 @@ def packaging(width: Num, length: Num, rectangles: DictGroup,
     rectangles : MutableMapping[Num, MutableMapping[Num, List[Optional[Tuple[Num, Num]]]]]
         Набор прямоугольников, сгруппированных по толщине и приоритету. 
         Словарь, где толщина является ключом, а значением - отображение 
-        приоритета в список прямоугольников.
+        приоритета в список прямоугольников. Также может быть передан 
+        колоночный набор Order.
     sorting : str, {'width', 'length'}, default='width'
         Вариант сортировки: width или length.
     strain : Union[int, float]
@@ -43,6 +63,21 @@ def packaging(width: Num, length: Num, rectangles: DictGroup,
         с учетом деформации после прокатки.
     rounding_func : Optional[Callable[[Num], Num]]
         Функция округления.
+    stats : Optional[PackingStats]
+        Объект для сбора статистики работы алгоритма.
+    item_types : bool, default=False
+        Объединять одинаковые прямоугольники приоритета в типы с 
+        количеством копий (см. TypeIndex). Ускоряет упаковку заказов с 
+        большим числом повторяющихся деталей, но при равенстве вариантов 
+        размещения порядок выбора копий может отличаться.
+    cuts : Optional[CutTree]
+        Объект для записи дерева гильотинных резов каждой полосы.
+    progress : Optional[Callable[[Num, int], None]]
+        Функция, которая вызывается после каждой полосы (и каждые 
+        PROGRESS_STEP размещений на листе фиксированной длины) с толщиной и 
+        количеством уже размещенных прямоугольников этой толщины. 
+        Исключение, вызванное функцией, прерывает упаковку, так можно 
+        реализовать отмену.
 
     Returns
     -------
@@ -57,21 +92,139 @@ def packaging(width: Num, length: Num, rectangles: DictGroup,
         Незадествованная длина.
     Examples
     --------
+    Длина листа для толщины 2.0 округляется до 48.2, поэтому деталь 
+    помещается:
 
+    >>> res, indices, length_marking, unused = packaging(10, 30, {3.0: {2: [(5, 5)]}, 2.0: {1: [(10, 48.2)]}}, strain=1.07)
+    >>> res
+    {2.0: {1: [Rectangle(x=0.0, y=0.0, w=10, l=48.2, idx=0)]}}
     """
-    length_marking = {}  # значения длин выделенных для каждой толщины (группы)
-    res: ResDictGroup = {}  # результат
+    conversion_height, transformed_rectangles, indices = prepare(rectangles, sorting, item_types)
+    res, length_marking, length = pack_sheet(width, length, transformed_rectangles, indices, 
+                                             conversion_height, sorting, strain=strain, stats=stats, 
+                                             cuts=cuts, progress=progress)
+    indices = {h: {p: list(idxs) for p, idxs in g.items()} for h, g in indices.items()}
+    return res, indices, length_marking, length
+
+
+def packaging_sheets(stock: Iterable[Tuple[Num, Num]], rectangles: Union[DictGroup, Order], 
+                     sorting: str="width", strain: Num=1., 
+                     rounding_func: Optional[Callable[[Num], Num]]=None, 
+                     stats: Optional[PackingStats]=None, 
+                     item_types: bool=False, 
+                     cuts: Optional[CutTree]=None, 
+                     progress: Optional[Callable[[Num, int], None]]=None) -> Tuple[List[Sheet], DictGroupIdx]:
+    """Упаковка прямоугольников на несколько листов
 
+    Листы берутся из stock по очереди, пока не будут размещены все 
+    прямоугольники. Отсортированный набор и индексы групп строятся 
+    один раз и используются для всех листов. Упаковка прекращается, 
+    если на очередной лист не удалось поместить ни одного прямоугольника 
+    или stock закончился.
+
+    Полоса, которая не помещается на лист, не упаковывается до конца 
+    (см. early_stop в pack_sheet), поэтому раскрой первого листа может 
+    незначительно отличаться от результата packaging.
+
+    Parameters
+    ----------
+    stock : Iterable[Tuple[Num, Num]]
+        Размеры листов (ширина, длина). Для одинаковых листов можно 
+        использовать itertools.repeat((width, length)).
+    rectangles, sorting, strain, rounding_func, stats, item_types, cuts, progress :
+        См. packaging. Полосы в cuts помечаются номером листа, а 
+        progress получает количество прямоугольников на текущем листе.
+
+    Returns
+    -------
+    sheets : List[Sheet]
+        Результаты по листам: размеры листа, размещенные прямоугольники, 
+        длины полос каждой толщины и незадействованная длина, как в packaging.
+    indices : MutableMapping[Num, MutableMapping[Num, List[int]]]
+        Индексы прямоугольников, не размещенных ни на одном листе.
+    """
+    conversion_height, transformed_rectangles, indices = prepare(rectangles, sorting, item_types)
+    sheets: List[Sheet] = []
+    for width, length in stock:
+        if not any(idxs for g in indices.values() for idxs in g.values()):
+            break
+        if cuts is not None:
+            cuts.sheet = len(sheets)
+        res, length_marking, unused = pack_sheet(width, length, transformed_rectangles, indices, 
+                                                 conversion_height, sorting, strain=strain, 
+                                                 stats=stats, early_stop=True, cuts=cuts, 
+                                                 progress=progress)
+        if not res:
+            break
+        sheets.append(Sheet(width, length, res, length_marking, unused))
+
+    indices = {h: {p: list(idxs) for p, idxs in g.items()} for h, g in indices.items()}
+    return sheets, indices
+
+
+def prepare(rectangles: Union[DictGroup, Order], sorting: str, 
+            item_types: bool=False) -> Tuple[Num, DictGroup, DictGroupIdx]:
+    """Подготовка набора к упаковке: толщина преобразования, повернутый набор и индексы
+
+    Для Order поворот и сортировка выполняются по столбцам 
+    (Order.canonical и Order.sort_indices), а словарь строится один 
+    раз, сразу из повернутого набора.
+    """
+    if isinstance(rectangles, Order):
+        return prepare_order(rectangles, sorting, item_types)
     # толщина для преобразования, по максимальной толщине первого приоритета группы
     conversion_height = max([(k, min(v.keys())) for k, v in rectangles.items()], key=lambda x: x[0])[0]
 
-    transformed_rectangles = deepcopy(rectangles)
-    transformed_rectangles, indices = sort_rectangles(transformed_rectangles, sorting)
-    
+    # исходный набор не изменяется, копируются только списки с повернутыми прямоугольниками
+    transformed_rectangles = normalize_rectangles(rectangles)
+    transformed_rectangles, indices = sort_rectangles(transformed_rectangles, sorting, 
+                                                      item_types=item_types)
+    return conversion_height, transformed_rectangles, indices
+
+
+def prepare_order(order: Order, sorting: str, 
+                  item_types: bool=False) -> Tuple[Num, DictGroup, DictGroupIdx]:
+    """Вариант prepare для колоночного набора"""
+    conversion_height = max(h for h, _ in order.offsets)
+    canonical = order.canonical()
+    sorted_indices = canonical.sort_indices(sorting)
+    transformed_rectangles = canonical.to_dict()
+    wh = 0 if sorting == "width" else 1
+    index_cls = TypeIndex if item_types else PieceIndex
+    indices: DictGroupIdx = {
+        h: {p: index_cls(ids, transformed_rectangles[h][p], key=wh) for p, ids in group.items()}
+        for h, group in sorted_indices.items()
+    }
+    return conversion_height, transformed_rectangles, indices
+
+
+def pack_sheet(width: Num, length: Num, transformed_rectangles: DictGroup, indices: DictGroupIdx, 
+               conversion_height: Num, sorting: str, strain: Num=1., 
+               stats: Optional[PackingStats]=None, early_stop: bool=False, 
+               cuts: Optional[CutTree]=None, 
+               progress: Optional[Callable[[Num, int], None]]=None) -> Tuple[ResDictGroup, Dict[Num, Num], Num]:
+    """Упаковка оставшихся прямоугольников на один лист
+
+    Размещенные прямоугольники удаляются из indices, поэтому функцию 
+    можно вызывать повторно для следующего листа.
+
+    Если early_stop=True, phspprg прекращает упаковку, как только полоса 
+    перестает помещаться на лист, а не размещает всю группу целиком. 
+    Порядок равных прямоугольников после возврата в индексы при этом 
+    может отличаться от packaging.
+
+    Если задан progress, он вызывается после каждой полосы phspprg, 
+    каждые PROGRESS_STEP размещений phsbpprg и после каждой группы с 
+    количеством размещенных на листе прямоугольников толщины.
+    """
+    length_marking = {}  # значения длин выделенных для каждой толщины (группы)
+    res: ResDictGroup = {}  # результат
+
     sorted_keys_all: List[Tuple[Num, Num]] = []
-    for h, g in transformed_rectangles.items():
+    for h, g in indices.items():
         sorted_keys_all.extend(product((h, ), [p for p, v in g.items() if v]))
     sorted_keys_all = sorted(sorted_keys_all, key=lambda x: (x[1], -x[0]))
+    placed: Dict[Num, int] = {}  # количество размещенных прямоугольников каждой толщины
 
     for height, p in sorted_keys_all:
         if (height in res) and (not indices[height][p]):  # пустой
@@ -81,20 +234,41 @@ def packaging(width: Num, length: Num, rectangles: DictGroup,
         current_y = length_marking[height]
         group = transformed_rectangles[height]
         if height != 3.0:                                                                                              
-            new_len = deformation(length, conversion_height, height, strain=strain, rounding_func=lambda x: round(x, 1))
+            new_len = deformation(length, conversion_height, height, strain=strain, rounding_func=_round_1)
         else:
             new_len = length                                                                                          
-        # получаем и упаковываем группы прямоугольников на лист с неизвестно длиной
-        l, rect = phspprg(width, group, indices[height], y0=current_y)
-        if l > new_len:
-            reestablish(indices[height], rect)
-            transformed_rectangles, indices = sort_rectangles(transformed_rectangles, sorting, indices)
-            upper_bound, rect = phsbpprg(width, length, group, indices[height], y0=current_y)  # TODO: приоритет не учитывается
-            if upper_bound == 0:
-                continue
-            l = upper_bound - current_y
+        if cuts is not None:
+            cuts.height = height
+            mark = len(cuts)
+        on_strip = None
+        if progress is not None:
+            before = placed.setdefault(height, 0)
+            on_strip = lambda n, height=height, before=before: progress(height, before + n)
+        with stats.span('group', height=height, priority=p) if stats else nullcontext():
+            # получаем и упаковываем группы прямоугольников на лист с неизвестно длиной
+            l, rect = phspprg(width, group, indices[height], y0=current_y, stats=stats, 
+                              max_length=new_len if early_stop else None, cuts=cuts, 
+                              progress=on_strip)
+            if l > new_len:
+                if stats:
+                    stats.fallbacks += 1
+                if cuts is not None:
+                    cuts.truncate(mark)
+                reestablish(indices[height], rect)
+                transformed_rectangles, indices = sort_rectangles(transformed_rectangles, sorting, indices)
+                upper_bound, rect = phsbpprg(width, length, group, indices[height], y0=current_y, 
+                                             stats=stats, cuts=cuts, 
+                                             progress=on_strip)  # TODO: приоритет не учитывается
+                if upper_bound == 0:
+                    if cuts is not None:
+                        cuts.truncate(mark)
+                    continue
+                l = upper_bound - current_y
 
         length_marking[height] += l
+        if progress is not None:
+            placed[height] += sum(len(list_r) for list_r in rect.values())
+            progress(height, placed[height])
 
         if height in res:
             for key, list_r in rect.items():
@@ -105,22 +279,46 @@ def packaging(width: Num, length: Num, rectangles: DictGroup,
         else:
             res[height] = rect
 
-        length -= back_deformation(l, conversion_height, height, strain=strain, rounding_func=lambda x: round(x, 4))
+        length -= back_deformation(l, conversion_height, height, strain=strain, rounding_func=_round_4)
         if length == 0:
             break
     
     res = dict(sorted(res.items(), key=lambda x: -x[0]))
     length_marking = dict(sorted(length_marking.items(), key=lambda x: -x[0]))
-    return res, indices, length_marking, length
+    return res, length_marking, length
+
+
+def normalize_rectangles(rectangles: DictGroup) -> DictGroup:
+    """Набор прямоугольников, у которых ширина не превышает длину
+
+    Списки групп, в которых поворачивать нечего, не копируются, а 
+    используются совместно с rectangles, поэтому память под второй 
+    экземпляр набора выделяется только для измененных групп.
+    """
+    normalized: DictGroup = {}
+    for height, group in rectangles.items():
+        normalized[height] = {}
+        for p, r_list in group.items():
+            if any(r[0] > r[1] for r in r_list):
+                r_list = [(r[1], r[0]) if r[0] > r[1] else r for r in r_list]
+            normalized[height][p] = r_list
+    return normalized
+
+
+def _is_sorted(index, rectangles, key: int) -> bool:
+    """Индекс уже упорядочен по key и не содержит возвращенных элементов"""
+    return (isinstance(index, PieceIndex) and index.key == key and 
+            index.rectangles is rectangles and not index.pending)
 
 
 def reestablish(indexes, donor):
+    """Возврат размещенных прямоугольников в конец индексов групп"""
     for p, list_r in donor.items():
         for r in list_r:
             indexes[p].append(r.idx)
 
 
-def sort_rectangles(rectangles, sorting: str, indices=None):
+def sort_rectangles(rectangles, sorting: str, indices=None, item_types: bool=False):
     if sorting not in ["width", "length"]:
         raise ValueError(f"The algorithm only supports sorting by width or length but {sorting} was given.")
     if sorting == "width":
@@ -138,21 +336,37 @@ def sort_rectangles(rectangles, sorting: str, indices=None):
             for i, r in enumerate(r_list):
                 if r[0] > r[1]:
                     r_list[i] = (r_list[i][1], r_list[i][0])
+            index_cls = TypeIndex if item_types else PieceIndex
             if p not in indices[height]:
-                indices[height][p] = sorted(range(len(r_list)), key=lambda x: -group[p][x][wh])
+                order = sorted(range(len(r_list)), key=lambda x: -group[p][x][wh])
+            elif _is_sorted(indices[height][p], r_list, wh):
+                continue
             else:
-                indices[height][p] = sorted(indices[height][p], key=lambda x: -group[p][x][wh])
+                if isinstance(indices[height][p], PieceIndex):
+                    index_cls = type(indices[height][p])  # при пересортировке вид индекса сохраняется
+                order = sorted(indices[height][p], key=lambda x: -group[p][x][wh])
+            indices[height][p] = index_cls(order, r_list, key=wh)
     
     return rectangles, indices
 
 
 def phsbpprg(width: Num, length: Num, rectangles: Group, 
-             indexes: GroupIdx, x0: Num=0., y0: Num=0.) -> Tuple[Num, ResGroup]:
-    """Функция упаковки листа с фиксированно длиной"""
+             indexes: GroupIdx, x0: Num=0., y0: Num=0., 
+             stats: Optional[PackingStats]=None, 
+             cuts: Optional[CutTree]=None, 
+             progress: Optional[Callable[[int], None]]=None) -> Tuple[Num, ResGroup]:
+    """Функция упаковки листа с фиксированно длиной
+
+    Если задан cuts, весь лист записывается в него как одна полоса. 
+    Если задан progress, он вызывается каждые PROGRESS_STEP размещений 
+    с количеством размещенных прямоугольников.
+    """
     
     result: ResGroup = {}
     
-    recursive_packing(x0, y0, width, length, 1, rectangles, indexes, result)
+    with stats.span('phsbpprg') if stats else nullcontext():
+        recursive_packing(x0, y0, width, length, 1, rectangles, indexes, result, stats=stats, cuts=cuts, 
+                          progress=progress)
 
     if result:
         real_lenght = max([max([r.y + r.l for r in list_r]) for p, list_r in result.items()])
@@ -162,9 +376,27 @@ def phsbpprg(width: Num, length: Num, rectangles: Group,
     return real_lenght, result
 
 
-def phspprg(width: Num, rectangles: Group, indices: GroupIdx, x0: Num=0., y0: Num=0) -> Tuple[Num, ResGroup]:
-    """Функция упаковки листа неограниченной длины"""
+def phspprg(width: Num, rectangles: Group, indices: GroupIdx, x0: Num=0., y0: Num=0, 
+            stats: Optional[PackingStats]=None, max_length: Optional[Num]=None, 
+            cuts: Optional[CutTree]=None, 
+            progress: Optional[Callable[[int], None]]=None) -> Tuple[Num, ResGroup]:
+    """Функция упаковки листа неограниченной длины
+
+    Если задан max_length, упаковка прекращается после полосы, на 
+    которой длина превысила max_length. Если задан cuts, в него 
+    записывается дерево резов каждой полосы: первый рез отделяет 
+    прямоугольник, открывающий полосу. Если задан progress, он 
+    вызывается после каждой полосы с количеством размещенных прямоугольников.
+    """
     
+    with stats.span('phspprg') if stats else nullcontext():
+        return _phspprg(width, rectangles, indices, x0, y0, stats, max_length, cuts, progress)
+
+
+def _phspprg(width: Num, rectangles: Group, indices: GroupIdx, x0: Num, y0: Num, 
+             stats: Optional[PackingStats], max_length: Optional[Num], 
+             cuts: Optional[CutTree], 
+             progress: Optional[Callable[[int], None]]=None) -> Tuple[Num, ResGroup]:
     result: ResGroup = {}
     
     max_priority = min([k for k, v in indices.items() if v])
@@ -183,63 +415,107 @@ def phspprg(width: Num, rectangles: Group, indices: GroupIdx, x0: Num=0., y0: Nu
         else:
             result[max_priority].append(Rectangle(x, y, r[1], r[0], idx))
             x, y, w, l, L = r[1], L, width - r[1], r[0], L + r[0]
-        recursive_packing(x, y, w, l, 1, rectangles, indices, result)
+        node = None
+        if cuts is not None:
+            strip = cuts.open_strip(0, y, width, l)
+            first, node = cuts.split(strip, X, x)
+            cuts.place(first, max_priority, idx)
+        recursive_packing(x, y, w, l, 1, rectangles, indices, result, stats=stats, cuts=cuts, node=node)
         x, y = 0, L
+        if progress is not None:
+            progress(sum(len(list_r) for list_r in result.values()))
+        if max_length is not None and L - y0 > max_length:
+            break
 
     return L - y0, result
 
 
 def recursive_packing(x: Num, y: Num, w: Num, h: Num, D: int, 
-                      remaining: Group, indices: GroupIdx, result: ResGroup) -> None:
-    """Helper function to recursively fit a certain area."""
-    g = len(remaining.keys())
-    variant: List[int] = []
-    orientation: List[int] = []
-    best: List[int] = []
-    priorities: List[Num] = []
-    for i, key in enumerate(remaining.keys()):
-        priorities.append(key)
-        v, o, b = get_best_fig(w, h, D, indices[key], remaining[key])
-        variant.append(v) 
-        orientation.append(o) 
-        best.append(b)
-
-    for i in range(g):
-        if variant[i] < 5:
-            key = priorities[i]
-            if orientation[i] == 0:
-                omega, d = remaining[key][best[i]]
+                      remaining: Group, indices: GroupIdx, result: ResGroup, 
+                      stats: Optional[PackingStats]=None, 
+                      cuts: Optional[CutTree]=None, node: Optional[int]=None, 
+                      progress: Optional[Callable[[int], None]]=None) -> None:
+    """Helper function to fit a certain area by guillotine sub-areas.
+
+    Sub-areas are kept on an explicit stack instead of recursive calls, 
+    so the depth is not limited by ``sys.getrecursionlimit()``. The 
+    pieces are placed in the same order as in the recursive version.
+
+    Candidates of a priority group are looked up in its ``PieceIndex``, 
+    plain lists of indices are scanned linearly by ``get_best_fig``.
+
+    If ``stats`` is given, the lookups, variants and the nesting depth 
+    of sub-areas are counted in it.
+
+    If ``cuts`` is given, every placement splits the current area node 
+    of the cut tree the same way the area is split into sub-areas. 
+    ``node`` is the tree node of the initial area; a new strip is opened 
+    for it when ``node`` is None.
+
+    If ``progress`` is given, it is called with the number of pieces 
+    placed by this call after every ``PROGRESS_STEP`` placements.
+    """
+    if cuts is not None and node is None:
+        node = cuts.open_strip(x, y, w, h)
+    stack: List[Tuple[Num, Num, Num, Num, int, Optional[int]]] = [(x, y, w, h, 1, node)]
+    placed = 0
+    while stack:
+        x, y, w, h, depth, node = stack.pop()
+
+        # the first priority group that has a fitting rectangle wins
+        variant, orientation, best, key = 6, None, None, None
+        for key in remaining.keys():
+            if isinstance(indices[key], PieceIndex):
+                probes = indices[key].probes
+                variant, orientation, best = indices[key].best_fit(w, h, D)
+                if stats:
+                    stats.candidates_scanned += indices[key].probes - probes
             else:
-                d, omega = remaining[key][best[i]]
-            if key not in result:
-                result[key] = []
-            result[key].append(Rectangle(x, y, omega, d, best[i]))
-            indices[key].remove(best[i])
-            if variant[i] == 2:
-                recursive_packing(x, y + d, w, h - d, D, remaining, indices, result)
-            elif variant[i] == 3:
-                recursive_packing(x + omega, y, w - omega, h, D, remaining, indices, result)
-            elif variant[i] == 4:
-                min_w, min_h = sys.maxsize, sys.maxsize
-                for p, idxs in indices.items():
-                    for idx in idxs:
-                        min_w = min(min_w, remaining[p][idx][0])
-                        min_h = min(min_h, remaining[p][idx][1])
-                # Because we can rotate:
-                min_w = min(min_h, min_w)
-                min_h = min_w
-                if w - omega < min_w:
-                    recursive_packing(x, y + d, w, h - d, D, remaining, indices, result)
-                elif h - d < min_h:
-                    recursive_packing(x + omega, y, w - omega, h, D, remaining, indices, result)
-                elif omega < min_w:
-                    recursive_packing(x + omega, y, w - omega, d, D, remaining, indices, result)
-                    recursive_packing(x, y + d, w, h - d, D, remaining, indices, result)
-                else:
-                    recursive_packing(x, y + d, omega, h - d, D, remaining, indices, result)
-                    recursive_packing(x + omega, y, w - omega, h, D, remaining, indices, result)
-            break
-    
+                variant, orientation, best = get_best_fig(w, h, D, indices[key], remaining[key])
+                if stats:
+                    stats.candidates_scanned += len(indices[key])
+            if stats:
+                stats.fit_calls += 1
+            if variant < 5:
+                break
+        if stats:
+            stats.variants[variant] += 1
+            stats.max_depth = max(stats.max_depth, depth)
+        if variant >= 5:
+            continue
+
+        if orientation == 0:
+            omega, d = remaining[key][best]
+        else:
+            d, omega = remaining[key][best]
+        if key not in result:
+            result[key] = []
+        result[key].append(Rectangle(x, y, omega, d, best))
+        indices[key].remove(best)
+        if progress is not None:
+            placed += 1
+            if not placed % PROGRESS_STEP:
+                progress(placed)
+        min_side = min_remaining_side(remaining, indices) if variant == 4 else 0
+        splits = guillotine_split(x, y, w, h, omega, d, variant, min_side)
+        nodes = cuts.record(node, splits, key, best) if cuts is not None else [None] * len(splits)
+        # sub-areas are pushed in cut order: the last pushed is filled first
+        for (_, _, area), child in zip(splits, nodes):
+            if area is not None:
+                stack.append((*area, depth + 1, child))
+
+
+def min_remaining_side(remaining: Group, indices: GroupIdx) -> Num:
+    """Наименьшая сторона среди оставшихся прямоугольников всех приоритетов"""
+    min_side: Num = sys.maxsize
+    for p, idxs in indices.items():
+        if isinstance(idxs, PieceIndex):
+            min_side = min(min_side, idxs.min_side())
+        else:
+            for idx in idxs:
+                min_side = min(min_side, remaining[p][idx][0], remaining[p][idx][1])
+    return min_side
+
 
 def get_best_fig(w: Num, l: Num, D: int, indices: List[int], remaining: List[RectType]) -> Tuple[int, int, int]:
     priority, orientation, best = 6, None, None  # mypy error Optional[int]
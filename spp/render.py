@@ -0,0 +1,148 @@
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import matplotlib.patches as patches
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .batch import JobResult, _map_chunks
+from .visualize import layout_arrays, patch_collection, visible_labels
+
+
+Num = Union[int, float]
+
+RenderJob = namedtuple('RenderJob', ('name', 'width', 'length_marking', 'rectangles', 'seed'),
+                       defaults=(0, ))
+
+# шаблоны фигур текущего процесса: (количество осей, размер, dpi) -> Figure
+_templates: Dict[Tuple[int, Tuple[Num, Num], Num], Figure] = {}
+
+
+def _template(n: int, figsize: Tuple[Num, Num], dpi: Num) -> Figure:
+    """Фигура с n осями, повторно используемая для следующих листов
+
+    Фигура создается без pyplot, поэтому не регистрируется в его
+    глобальном состоянии. Оси, подписи осей и шрифты сохраняются, а
+    перед новым листом удаляются только прямоугольники и подписи.
+    """
+    key = (n, figsize, dpi)
+    fig = _templates.get(key)
+    if fig is None:
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        for axis in fig.subplots(1, n, squeeze=False)[0]:
+            axis.set_xlabel('$x$')
+            axis.set_ylabel('$y$', rotation=0)
+        _templates[key] = fig
+    else:
+        for axis in fig.axes:
+            for artist in list(axis.collections) + list(axis.patches) + list(axis.texts):
+                artist.remove()
+    return fig
+
+
+def render_layout(name: str, width: Num, length_marking: Union[Sequence[Num], Dict[Num, Num]],
+                  rectangles, seed: Optional[int]=0, figsize: Optional[Tuple[Num, Num]]=None,
+                  dpi: Num=100, max_labels: int=300) -> str:
+    """Запись карты раскроя в файл без интерактивного окна
+
+    Карта строится так же, как в visualize_separately: по одним осям на
+    каждую толщину. Формат файла (PNG, SVG, PDF и др.) определяется по
+    расширению name. Подписи выводятся только для прямоугольников,
+    достаточно крупных при заданных размере и разрешении (см.
+    visible_labels).
+
+    Parameters
+    ----------
+    name : str
+        Имя файла.
+    width, length_marking, rectangles :
+        Ширина листа, длины полос и результат packaging. length_marking
+        может быть словарем, как его возвращает packaging.
+    seed : Optional[int], default=0
+        Начальное значение генератора цветов, одинаковое значение дает
+        одинаковые цвета.
+    figsize : Optional[Tuple[Num, Num]]
+        Размер фигуры в дюймах, по умолчанию 4 дюйма на толщину в ширину
+        и 8 в высоту.
+    dpi : Num, default=100
+        Разрешение для растровых форматов.
+    max_labels : int, default=300
+        Наибольшее количество подписей на одних осях.
+
+    Returns
+    -------
+    name : str
+        Имя записанного файла.
+    """
+    if isinstance(length_marking, dict):
+        length_marking = list(length_marking.values())
+    n = max(len(rectangles), 1)
+    if figsize is None:
+        figsize = (4 * n, 8)
+    fig = _template(n, tuple(figsize), dpi)
+    rng = np.random.default_rng(seed)
+    for axis, (h, group), length in zip(fig.axes, rectangles.items(), length_marking):
+        axis.add_patch(patches.Rectangle((0, 0), width, length, hatch='x', fill=False))
+        list_r = [r for list_r in group.values() for r in list_r]
+        xywl = layout_arrays(list_r)
+        patch_collection(axis, xywl, rng.random((len(list_r), 3)), edgecolors='k', linewidths=0.5)
+        axis.set_xlim(0, width)
+        axis.set_ylim(0, length or 1)
+        axis.set_aspect('equal', adjustable='box')
+        axis.title.set_text(f'Height {h} mm')
+        for i in visible_labels(axis, xywl, max_labels).tolist():
+            x, y, w, l = xywl[i]
+            axis.text(x + 0.5 * w, y + 0.5 * l, str(list_r[i].idx), clip_on=True)
+    fig.savefig(name)
+    return name
+
+
+def _render_chunk(chunk: List[tuple], options: dict) -> List[JobResult]:
+    results = []
+    for index, job in chunk:
+        try:
+            job = RenderJob(*job)
+            name = render_layout(job.name, job.width, job.length_marking, job.rectangles,
+                                 seed=job.seed, **options)
+        except Exception as e:
+            results.append(JobResult(index, None, e))
+        else:
+            results.append(JobResult(index, name, None))
+    return results
+
+
+def render_many(jobs: Iterable[RenderJob], workers: Optional[int]=None, chunksize: int=1,
+                ordered: bool=True, **options) -> Iterator[JobResult]:
+    """Пакетная запись карт раскроя в файлы в пуле процессов
+
+    Каждый процесс хранит свои шаблоны фигур, поэтому листы с
+    одинаковым количеством толщин используют одну фигуру. Ошибка
+    записи одного листа не прерывает остальные.
+
+    Parameters
+    ----------
+    jobs : Iterable[RenderJob]
+        Задания: кортежи (name, width, length_marking, rectangles, seed),
+        последнее поле необязательно.
+    workers, chunksize, ordered :
+        См. packaging_many.
+    options :
+        Параметры render_layout: figsize, dpi, max_labels.
+
+    Returns
+    -------
+    results : Iterator[JobResult]
+        Результаты (index, name, error), где name - имя записанного файла.
+    """
+    return _map_chunks(_render_chunk, jobs, workers, chunksize, ordered, options)
+
+
+def sheet_jobs(sheets, pattern: str='sheet_{:03d}.png') -> List[RenderJob]:
+    """Задания для render_many по результату packaging_sheets
+
+    Имя файла каждого листа получается из pattern подстановкой номера листа.
+    """
+    return [RenderJob(pattern.format(i), sheet.width, sheet.length_marking, sheet.res, i)
+            for i, sheet in enumerate(sheets)]
@@ -0,0 +1,81 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Union
+
+
+Num = Union[int, float]
+
+
+class PackingStats:
+    """Сбор статистики работы алгоритма упаковки
+
+    Объект передается в packaging, phspprg, phsbpprg или
+    recursive_packing через параметр stats. Если параметр не задан,
+    статистика не собирается и дополнительных затрат нет.
+
+    Attributes
+    ----------
+    fit_calls : int
+        Количество вызовов поиска лучшего прямоугольника (get_best_fig
+        или PieceIndex.best_fit).
+    candidates_scanned : int
+        Объем работы поиска: количество прямоугольников, просмотренных
+        линейным перебором get_best_fig, а для PieceIndex - количество
+        обращений к корзинам и узлов дерева отрезков (PieceIndex.probes).
+    variants : Counter
+        Распределение вариантов размещения 1-4 и промахов (5, 6), когда
+        в области не поместился ни один прямоугольник.
+    max_depth : int
+        Максимальная глубина вложенности подобластей, соответствует
+        глубине рекурсии рекурсивного варианта recursive_packing.
+    fallbacks : int
+        Количество переходов от phspprg к phsbpprg в packaging.
+    group_time : Dict[Num, float]
+        Время упаковки каждой толщины в секундах.
+    events : List[dict]
+        События в формате Chrome trace (ph='X').
+    """
+    def __init__(self) -> None:
+        self.fit_calls = 0
+        self.candidates_scanned = 0
+        self.variants: Counter = Counter()
+        self.max_depth = 0
+        self.fallbacks = 0
+        self.group_time: Dict[Num, float] = {}
+        self.events: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        """Замер интервала, который попадает в события трассировки"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                                'ts': (start - self._start) * 1e6,
+                                'dur': (end - start) * 1e6, 'args': args})
+            if name == 'group':
+                height = args['height']
+                self.group_time[height] = self.group_time.get(height, 0.) + end - start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Статистика в виде словаря (без событий трассировки)"""
+        return {
+            'fit_calls': self.fit_calls,
+            'candidates_scanned': self.candidates_scanned,
+            'variants': dict(sorted(self.variants.items())),
+            'max_depth': self.max_depth,
+            'fallbacks': self.fallbacks,
+            'group_time': dict(self.group_time),
+        }
+
+    def to_chrome_trace(self, name: str) -> None:
+        """Запись событий в JSON файл для chrome://tracing или Perfetto"""
+        if not name.endswith('.json'):
+            name += '.json'
+        with open(name, 'w') as f:
+            json.dump({'traceEvents': self.events, 'otherData': self.to_dict()}, f)
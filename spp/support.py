@@ -1,8 +1,14 @@
+import gc
+import io
 import json
-from copy import deepcopy
-from typing import List, Tuple, Union, Optional, MutableMapping, Callable
+import os
+from functools import partial
+from typing import List, Tuple, Union, Optional, MutableMapping, Callable, Sequence
+
+import numpy as np
 
 from .rectangle import Rectangle
+from .order import Order
 
 
 Num = Union[int, float]
@@ -64,7 +70,13 @@ def scaling_all_group(rectangles: DictGroup, strain: Num=1., h1: Optional[Num]=N
     {3.0: {1: [(2, 3), (5, 5)]}, 2.0: {1: [(10, 7)]}, 1.0: {2: [(7, 3)], 3: [(5, 1), (4, 2)]}}
     >>> scaling_all_group(d, strain=1.1, rounding_func=lambda x: round(x, 1)) 
     {3.0: {1: [(2, 3), (5, 5)]}, 2.0: {1: [(10, 7.3)]}, 1.0: {2: [(7, 3.3)], 3: [(5, 1.1), (4, 2.2)]}}
+
+    Для колоночного представления Order масштабирование выполняется 
+    векторно, см. Order.scaled.
     """
+    if isinstance(rectangles, Order):
+        return rectangles.scaled(strain=strain, h1=h1, rounding_func=rounding_func)
+
     if h1 is None:
         h1 = max(rectangles.keys())
 
@@ -75,7 +87,8 @@ def scaling_all_group(rectangles: DictGroup, strain: Num=1., h1: Optional[Num]=N
             remaining[height] = scaling(group, height, h1, 
                                         strain=strain, rounding_func=rounding_func)
         else:
-            remaining[height] = deepcopy(group)  # mypy error, Sequence to List
+            # кортежи неизменяемы, поэтому копируются только списки
+            remaining[height] = {p: list(v) for p, v in group.items()}
     
     return remaining
 
@@ -132,16 +145,17 @@ def scaling(group: Group, height: Num, h1: Num, strain: Num=1.,
     >>> scaling(d, 1.0, 3.0, strain=1.1, rounding_func=lambda x: round(x, 1)) 
     {1: [(6, 1.5), (5, 2.6)], 2: [(10, 3.7)]}
     """
+    # длины всей группы пересчитываются одним проходом NumPy
     new_group: Group = {}
-
+    round_array = vectorize_rounding(rounding_func)
     for priority, v in group.items():
-        new_group[priority] = []
-        for i, r in enumerate(v):
-            l_1 = deformation(r[1], height, h1, strain=strain, rounding_func=rounding_func)
-            # l_1 = strain * (height * r[1] / h1)
-            # if rounding_func is not None:
-            #     l_1 = rounding_func(l_1)
-            new_group[priority].append((r[0], l_1))
+        if not v:
+            new_group[priority] = []
+            continue
+        l_1 = deformation_array([r[1] for r in v], height, h1, strain=strain)
+        if round_array is not None:
+            l_1 = round_array(l_1)
+        new_group[priority] = [(r[0], l) for r, l in zip(v, l_1.tolist())]
     
     return new_group
 
@@ -160,6 +174,40 @@ def back_deformation(length, height: Num, h1: Num, strain: Num=1., rounding_func
     return l_1
 
 
+def deformation_array(lengths, height: Num, h1: Num, strain: Num=1., 
+                      rounding_func: Optional[Callable[[Num], Num]]=None) -> np.ndarray:
+    """Векторный вариант deformation для массива длин одной толщины
+
+    Операции выполняются в том же порядке, что и в deformation, поэтому 
+    результаты совпадают поэлементно.
+    """
+    l_1 = strain * (height * np.asarray(lengths, dtype=float) / h1)
+    round_array = vectorize_rounding(rounding_func)
+    return l_1 if round_array is None else round_array(l_1)
+
+
+def vectorize_rounding(rounding_func: Optional[Callable[[Num], Num]]) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """Функция округления, применяемая сразу ко всему массиву
+
+    Встроенная round заменяется на np.rint, результат - целые числа. 
+    Остальные функции, в том числе partial(round, ndigits=n), применяются 
+    поэлементно: np.round округляет иначе, чем round (например, 2.675 
+    до двух знаков), и результаты разошлись бы со скалярными функциями.
+
+    Examples
+    --------
+    >>> vectorize_rounding(round)(np.array([1.4, 2.6])).tolist()
+    [1, 3]
+    >>> vectorize_rounding(partial(round, ndigits=2))(np.array([2.675, 1.115])).tolist()
+    [2.67, 1.11]
+    """
+    if rounding_func is None:
+        return None
+    if rounding_func is round:
+        return lambda a: np.rint(a).astype(np.int64)
+    return lambda a: np.array([rounding_func(v) for v in np.asarray(a).tolist()])
+
+
 def items_by_index(rectangles: DictGroup, indices: DictGroupIdx) -> DictGroup:
     """Получение выборки элементов из вложенного словаря по индексам
 
@@ -182,15 +230,68 @@ def items_by_index(rectangles: DictGroup, indices: DictGroupIdx) -> DictGroup:
     >>> items_by_index(d, idxs) 
     {3.0: {2: [(4, 3)]}, 2.0: {3: [(5, 3), (1, 2)]}}
     """
+    if isinstance(rectangles, Order):
+        return rectangles.select(indices)
+
     d: DictGroup = {}
     for h, group in indices.items():
         d[h] = {}
         for p, idx in group.items():
+            idx = set(idx)
             d[h][p] = [item for i, item in enumerate(rectangles[h][p]) if i in idx]
 
     return d
 
 
+def split_by_index(rectangles: DictGroup, indices: DictGroupIdx) -> Tuple[DictGroup, DictGroup]:
+    """Разбиение набора на элементы с указанными индексами и остальные
+
+    Выполняется за один проход по каждой группе. Обе части имеют ту же 
+    структуру, что и rectangles, порядок элементов внутри групп сохраняется.
+    Например, для индексов неразмещенных элементов, которые возвращает 
+    packaging, первая часть содержит неразмещенные, а вторая - 
+    размещенные прямоугольники.
+
+    Parameters
+    ----------
+    rectangles : MutableMapping[Num, MutableMapping[Num, List[Optional[Tuple[Num, Num]]]]]
+        Набор прямоугольников, сгруппированных по толщине и приоритету.
+    indices : 
+        Индексы элементов, той же структуры, что и rectangles.
+
+    Returns
+    -------
+    selected : MutableMapping[Num, MutableMapping[Num, List[Optional[Tuple[Num, Num]]]]]
+        Элементы, индексы которых указаны в indices.
+    rest : MutableMapping[Num, MutableMapping[Num, List[Optional[Tuple[Num, Num]]]]]
+        Остальные элементы.
+
+    Examples
+    --------
+    >>> d = {3.0: {2: [(7, 9), (4, 3), (5, 5)]}, 2.0: {1: [(2, 4)], 3: [(5, 3), (4, 6), (1, 2)]}}
+    >>> idxs = {3.0: {2: [1]}, 2.0: {3: [0, 2]}}
+    >>> selected, rest = split_by_index(d, idxs)
+    >>> selected
+    {3.0: {2: [(4, 3)]}, 2.0: {1: [], 3: [(5, 3), (1, 2)]}}
+    >>> rest
+    {3.0: {2: [(7, 9), (5, 5)]}, 2.0: {1: [(2, 4)], 3: [(4, 6)]}}
+    """
+    if isinstance(rectangles, Order):
+        return rectangles.partition(indices)
+
+    selected: DictGroup = {}
+    rest: DictGroup = {}
+    for h, group in rectangles.items():
+        selected[h], rest[h] = {}, {}
+        for p, r_list in group.items():
+            idx = set(indices.get(h, {}).get(p, ()))
+            selected[h][p], rest[h][p] = [], []
+            for i, item in enumerate(r_list):
+                (selected if i in idx else rest)[h][p].append(item)
+
+    return selected, rest
+
+
 def add_allowance(rectangles, allowance):
     """Добавление припусков к размерам прямоугольников"""
     # TODO: Добавить реализацию
@@ -223,6 +324,8 @@ def get_strip_lengths(length, group_len, strain=1., rounding_func=None):
 
 
 def area(rectangles, as_nt=False):
+    if isinstance(rectangles, Order):
+        return rectangles.area()
     s = dict()
     for h, group in rectangles.items():
         s[h] = 0.
@@ -241,43 +344,229 @@ def to_json(name: str, rectangles: DictGroup) -> None:
         name += '.json'
     
     with open(name, 'w') as f:
-        res = _to_json(rectangles, indent=4)
-        f.write(res)
-        # json.dump(res, f, indent=4)
+        _write_json(f, rectangles, indent=4)
 
 
 def _to_json(o, level=0, indent=4):
+    f = io.StringIO()
+    _write_json(f, o, level=level, indent=indent)
+    return f.getvalue()
+
+
+def _write_json(f, o, level=0, indent=4):
+    """Запись o в файловый объект f по частям, без сборки документа в памяти"""
     SPACE = " "
     NEWLINE = "\n"
-    ret = ""
+    write = f.write
     if isinstance(o, dict):
-        ret += "{" + NEWLINE
+        write("{" + NEWLINE)
         comma = ""
         for k,v in o.items():
-            ret += comma
+            write(comma)
             comma = ",\n"
-            ret += SPACE * indent * (level+1)
-            ret += '"' + str(k) + '":' + SPACE
-            ret += _to_json(v, level + 1)
+            write(SPACE * indent * (level+1) + '"' + str(k) + '":' + SPACE)
+            _write_json(f, v, level + 1, indent)
 
-        ret += NEWLINE + SPACE * indent * level + "}"
+        write(NEWLINE + SPACE * indent * level + "}")
     elif isinstance(o, list):
-        ret += "["
+        write("[")
         if len(o) > 1 and isinstance(o[0], (tuple, list, dict)):
-            ret += NEWLINE + SPACE * indent * (level+1)
-            ret += ("," + NEWLINE + SPACE * indent * (level+1)).join([_to_json(e, level+1) for e in o])
-            ret += NEWLINE + SPACE * indent * level
+            sep = "," + NEWLINE + SPACE * indent * (level+1)
+            write(NEWLINE + SPACE * indent * (level+1))
+            for i, e in enumerate(o):
+                if i:
+                    write(sep)
+                _write_json(f, e, level + 1, indent)
+            write(NEWLINE + SPACE * indent * level)
         else:
-            ret += ", ".join([_to_json(e, level+1) for e in o])
-        ret += "]"
+            for i, e in enumerate(o):
+                if i:
+                    write(", ")
+                _write_json(f, e, level + 1, indent)
+        write("]")
     elif isnamedtupleinstance(o):
-        ret += json.dumps(o._asdict())
-    # elif isinstance(o, numpy.ndarray) and numpy.issubdtype(o.dtype, numpy.integer):
-    #     ret += "[" + ','.join(map(json.dumps, o.flatten().tolist())) + "]"
-    # elif isinstance(o, numpy.ndarray) and numpy.issubdtype(o.dtype, numpy.inexact):
-    #     ret += "[" + ','.join(map(lambda x: json.dumps(x), o.flatten().tolist())) + "]"
+        write(json.dumps(o._asdict()))
     elif isinstance(o, (str, bool, int, float, tuple, list)) or o is None:
-        ret += json.dumps(o)
+        write(json.dumps(o))
     else:
         raise TypeError("Unknown type '%s' for json serialization" % str(type(o)))
-    return ret
\ No newline at end of file
+
+
+def save_layout(name: str, res, length_marking: Optional[MutableMapping[Num, Num]]=None) -> None:
+    """Запись результата упаковки в компактный двоичный файл .npz
+
+    Размещенные прямоугольники хранятся по столбцам (x, y, w, l, idx), 
+    группы (толщина, приоритет) - границами строк.
+    """
+    if not name.endswith('.npz'):
+        name += '.npz'
+    keys, offsets = [], [0]
+    x, y, w, l, idx = [], [], [], [], []
+    for h, group in res.items():
+        for p, list_r in group.items():
+            keys.append((h, p))
+            offsets.append(offsets[-1] + len(list_r))
+            for r in list_r:
+                x.append(r.x)
+                y.append(r.y)
+                w.append(r.w)
+                l.append(r.l)
+                idx.append(r.idx)
+    if length_marking is None:
+        length_marking = {}
+    np.savez(name, x=np.array(x), y=np.array(y), w=np.array(w), l=np.array(l), 
+             idx=np.array(idx, dtype=np.intp), 
+             group_thickness=np.array([h for h, _ in keys], dtype=float), 
+             group_priority=np.array([p for _, p in keys]), 
+             group_offsets=np.array(offsets, dtype=np.intp), 
+             marking_thickness=np.array(list(length_marking.keys()), dtype=float), 
+             marking_length=np.array(list(length_marking.values()), dtype=float))
+
+
+def load_layout(name: str, columns: bool=False):
+    """Чтение результата упаковки, записанного save_layout
+
+    Parameters
+    ----------
+    name : str
+        Имя файла .npz.
+    columns : bool, default=False
+        Вместо списков Rectangle вернуть для каждой группы срез записи 
+        numpy.recarray с полями x, y, w, l, idx. Срезы не копируют данные, 
+        поэтому такое чтение почти не зависит от количества прямоугольников.
+
+    Returns
+    -------
+    res : MutableMapping[Num, MutableMapping[Num, List[Rectangle]]]
+        Размещенные прямоугольники, сгруппированные по толщине и приоритету.
+    length_marking : MutableMapping[Num, Num]
+        Длины полос каждой толщины (пустой словарь, если не были записаны).
+    """
+    with np.load(name) as data:
+        if columns:
+            rects = np.rec.fromarrays([data['x'], data['y'], data['w'], data['l'], data['idx']], 
+                                      names=Rectangle._fields)
+        else:
+            # сборщик мусора отключается на время создания большого числа кортежей
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                rects = list(map(Rectangle, data['x'].tolist(), data['y'].tolist(), 
+                                 data['w'].tolist(), data['l'].tolist(), data['idx'].tolist()))
+            finally:
+                if gc_enabled:
+                    gc.enable()
+        offsets = data['group_offsets'].tolist()
+        res: MutableMapping = {}
+        for i, (h, p) in enumerate(zip(data['group_thickness'].tolist(), data['group_priority'].tolist())):
+            res.setdefault(h, {})[p] = rects[offsets[i]:offsets[i + 1]]
+        length_marking = dict(zip(data['marking_thickness'].tolist(), data['marking_length'].tolist()))
+    return res, length_marking
+
+
+def save_order(name: str, rectangles) -> None:
+    """Запись набора прямоугольников (словарь или Order) в файл .npz"""
+    if not name.endswith('.npz'):
+        name += '.npz'
+    if not isinstance(rectangles, Order):
+        rectangles = Order.from_dict(rectangles)
+    keys = list(rectangles.offsets)
+    np.savez(name, idx=rectangles.idx, thickness=rectangles.thickness, priority=rectangles.priority, 
+             width=rectangles.width, length=rectangles.length, 
+             group_thickness=np.array([h for h, _ in keys], dtype=float), 
+             group_priority=np.array([p for _, p in keys]), 
+             group_offsets=np.array([0] + [stop for _, stop in rectangles.offsets.values()], dtype=np.intp))
+
+
+ORDER_COLUMNS = ('thickness', 'priority', 'width', 'length')
+
+
+def load_order(name: str, as_dict: bool=False, columns: Sequence[str]=ORDER_COLUMNS, 
+               delimiter: str=','):
+    """Чтение набора прямоугольников из файла
+
+    Формат определяется по расширению:
+
+    * .npz - файл, записанный save_order;
+    * .csv - таблица с заголовком, из которой берутся столбцы columns;
+    * .json - объект со списками-столбцами {"thickness": [...], ...}, 
+      список записей [{"thickness": ..., ...}, ...] или вложенный 
+      словарь толщина -> приоритет -> список [ширина, длина], как в to_json;
+    * .npy - структурированный массив с полями columns или массив 
+      размера (n, 4). У массива без полей имен нет, поэтому columns 
+      должен быть перестановкой ORDER_COLUMNS и задает порядок столбцов 
+      в файле. Файл отображается в память (mmap_mode='r').
+
+    Строки не превращаются в объекты Python: CSV и NPY читаются сразу 
+    в массивы NumPy, а группировка выполняется Order.from_columns. 
+    Исключение - JSON в виде списка записей.
+
+    Parameters
+    ----------
+    name : str
+        Имя файла.
+    as_dict : bool, default=False
+        Вернуть вложенный словарь вместо Order.
+    columns : Sequence[str]
+        Имена столбцов толщины, приоритета, ширины и длины.
+    delimiter : str, default=','
+        Разделитель для CSV.
+    """
+    ext = os.path.splitext(name)[1].lower()
+    if ext == '.npz':
+        with np.load(name) as data:
+            offsets = data['group_offsets'].tolist()
+            keys = zip(data['group_thickness'].tolist(), data['group_priority'].tolist())
+            order = Order(data['idx'], data['thickness'], data['priority'], data['width'], data['length'], 
+                          {key: (offsets[i], offsets[i + 1]) for i, key in enumerate(keys)})
+    elif ext == '.csv':
+        order = Order.from_columns(*_read_csv(name, columns, delimiter))
+    elif ext == '.json':
+        order = _read_json(name, columns)
+    elif ext == '.npy':
+        data = np.load(name, mmap_mode='r')
+        if data.dtype.names:
+            order = Order.from_columns(*(data[c] for c in columns))
+        else:
+            if sorted(columns) != sorted(ORDER_COLUMNS):
+                raise ValueError(f"Columns of an unstructured array must be a permutation of "
+                                 f"{ORDER_COLUMNS} but {tuple(columns)} was given.")
+            if data.ndim != 2 or data.shape[1] != 4:
+                raise ValueError(f"An unstructured order array must have shape (n, 4) but {data.shape} was given.")
+            order = Order.from_columns(*(data[:, list(columns).index(c)] for c in ORDER_COLUMNS))
+    else:
+        raise ValueError(f"Unknown order file format '{ext}'.")
+    return order.to_dict() if as_dict else order
+
+
+def _integral(a: np.ndarray) -> np.ndarray:
+    """Перевод вещественного столбца в целый, если все значения целые"""
+    if a.dtype.kind == 'f' and len(a) and np.array_equal(a, np.floor(a)):
+        return a.astype(np.int64)
+    return a
+
+
+def _read_csv(name: str, columns: Sequence[str], delimiter: str):
+    with open(name) as f:
+        header = [c.strip().strip('"') for c in f.readline().split(delimiter)]
+        usecols = [header.index(c) for c in columns]
+        data = np.loadtxt(f, delimiter=delimiter, usecols=usecols, ndmin=2, dtype=float)
+    thickness, priority, width, length = data.T
+    return thickness, _integral(priority), _integral(width), _integral(length)
+
+
+def _read_json(name: str, columns: Sequence[str]) -> Order:
+    with open(name) as f:
+        data = json.load(f)
+    if isinstance(data, dict) and all(c in data for c in columns):
+        return Order.from_columns(*(np.array(data[c]) for c in columns))
+    if isinstance(data, list):
+        if data and isinstance(data[0], dict):
+            rows = [[r[c] for c in columns] for r in data]
+        else:
+            rows = data
+        a = np.array(rows, dtype=float).reshape(-1, 4)
+        return Order.from_columns(a[:, 0], _integral(a[:, 1]), _integral(a[:, 2]), _integral(a[:, 3]))
+    # ключи JSON - строки, толщина переводится в float, приоритет в int
+    return Order.from_dict({float(h): {int(p): [tuple(r) for r in r_list] for p, r_list in group.items()}
+                            for h, group in data.items()})
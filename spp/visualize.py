@@ -1,9 +1,15 @@
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import matplotlib.gridspec as gridspec
+import numpy as np
+from matplotlib.collections import PolyCollection
 from random import uniform, random
 
 
+# при большем количестве прямоугольников подписи выводятся с уровнем детализации
+LOD_THRESHOLD = 1000
+
+
 def patch_rect(axis, xy, w, h, **kwargs):
     obj = axis.add_patch(
         patches.Rectangle(xy, w, h, **kwargs)
@@ -11,34 +17,165 @@ def patch_rect(axis, xy, w, h, **kwargs):
     return obj
 
 
-def visualize_separately(width, length_marking, rectangles):
+def layout_arrays(list_r, dy=0.):
+    """Координаты и размеры прямоугольников в виде массива (n, 4): x, y, w, l"""
+    xywl = np.array([(r.x, r.y, r.w, r.l) for r in list_r], dtype=float).reshape(-1, 4)
+    xywl[:, 1] += dy
+    return xywl
+
+
+def patch_collection(axis, xywl, colors, **kwargs):
+    """Все прямоугольники в виде одной коллекции вместо отдельных patches.Rectangle"""
+    x, y, w, l = xywl.T
+    verts = np.stack([np.stack([x, y], axis=1), np.stack([x + w, y], axis=1),
+                      np.stack([x + w, y + l], axis=1), np.stack([x, y + l], axis=1)], axis=1)
+    collection = PolyCollection(verts, facecolors=colors, **kwargs)
+    axis.add_collection(collection)
+    return collection
+
+
+def visible_labels(axis, xywl, max_labels=300, min_size=20):
+    """Номера прямоугольников, которые нужно подписать при текущих пределах осей
+
+    Подписываются только прямоугольники, центр которых виден в текущих
+    пределах осей, а стороны на экране не меньше min_size пикселей, но
+    не более max_labels штук.
+    """
+    (x0, x1), (y0, y1) = axis.get_xlim(), axis.get_ylim()
+    if x0 == x1 or y0 == y1 or not len(xywl):
+        return np.zeros(0, dtype=int)
+    x, y, w, l = xywl.T
+    cx, cy = x + 0.5 * w, y + 0.5 * l
+    bbox = axis.get_window_extent()
+    sx, sy = bbox.width / abs(x1 - x0), bbox.height / abs(y1 - y0)
+    mask = ((cx >= min(x0, x1)) & (cx <= max(x0, x1)) & (cy >= min(y0, y1)) & (cy <= max(y0, y1)) 
+            & (w * sx >= min_size) & (l * sy >= min_size))
+    return np.flatnonzero(mask)[:max_labels]
+
+
+def lod_labels(axis, xywl, labels, max_labels=300, min_size=20):
+    """Подписи прямоугольников с уровнем детализации
+
+    Набор подписей выбирается visible_labels и пересчитывается при
+    изменении пределов осей (масштабирование и сдвиг), объекты Text
+    используются повторно.
+    """
+    x, y, w, l = xywl.T
+    cx, cy = x + 0.5 * w, y + 0.5 * l
+    texts = []
+
+    def update(_=None):
+        selected = visible_labels(axis, xywl, max_labels, min_size)
+        while len(texts) < len(selected):
+            texts.append(axis.text(0, 0, '', clip_on=True))
+        for text, i in zip(texts, selected.tolist()):
+            text.set_position((cx[i], cy[i]))
+            text.set_text(labels[i])
+            text.set_visible(True)
+        for text in texts[len(selected):]:
+            text.set_visible(False)
+
+    axis.callbacks.connect('xlim_changed', update)
+    axis.callbacks.connect('ylim_changed', update)
+    update()
+    return update
+
+
+def add_labels(axis, xywl, labels, lod=None):
+    """Подписи в центре прямоугольников, при lod=True - с уровнем детализации
+
+    По умолчанию уровень детализации включается, если прямоугольников
+    больше LOD_THRESHOLD.
+    """
+    if lod is None:
+        lod = len(xywl) > LOD_THRESHOLD
+    if lod:
+        return lod_labels(axis, xywl, labels)
+    for (x, y, w, l), label in zip(xywl.tolist(), labels):
+        axis.text(x + 0.5 * w, y + 0.5 * l, label)
+
+
+class GridIndex:
+    """Индекс прямоугольников на равномерной сетке для поиска по точке
+
+    Строится один раз для графика: каждый прямоугольник записывается в
+    ячейки сетки, которые он пересекает, поэтому при щелчке проверяются
+    только прямоугольники одной ячейки, а не все.
+
+    Parameters
+    ----------
+    xywl : np.ndarray
+        Массив (n, 4): x, y, w, l, см. layout_arrays.
+    cells : Optional[int]
+        Количество ячеек по каждой оси, по умолчанию примерно sqrt(n).
+    """
+    def __init__(self, xywl, cells=None):
+        self.xywl = xywl
+        self._cells = {}
+        if not len(xywl):
+            return
+        if cells is None:
+            cells = max(1, int(len(xywl) ** 0.5))
+        x, y, w, l = xywl.T
+        self._x0, self._y0 = x.min(), y.min()
+        self._dx = ((x + w).max() - self._x0) / cells or 1.
+        self._dy = ((y + l).max() - self._y0) / cells or 1.
+        ix0, ix1 = self._cell(x, self._x0, self._dx), self._cell(x + w, self._x0, self._dx)
+        iy0, iy1 = self._cell(y, self._y0, self._dy), self._cell(y + l, self._y0, self._dy)
+        for k, (i0, i1, j0, j1) in enumerate(zip(ix0.tolist(), ix1.tolist(), iy0.tolist(), iy1.tolist())):
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    self._cells.setdefault((i, j), []).append(k)
+
+    @staticmethod
+    def _cell(v, v0, dv):
+        return np.floor((np.asarray(v) - v0) / dv).astype(int)
+
+    def query(self, x, y):
+        """Номер прямоугольника, внутри которого лежит точка, или None"""
+        if not self._cells:
+            return None
+        i, j = int(self._cell(x, self._x0, self._dx)), int(self._cell(y, self._y0, self._dy))
+        for k in self._cells.get((i, j), ()):
+            x0, y0, w, l = self.xywl[k]
+            if (x0 < x < x0 + w) and (y0 < y < y0 + l):
+                return k
+        return None
+
+
+def visualize_separately(width, length_marking, rectangles, lod=None):
     n = len(rectangles.keys())
     fig, axes = plt.subplots(1, n)
     if n == 1:
         axes = [axes]
-    rectangles_with_annotation = []
+    charts = {}
     for i, (h, group) in enumerate(rectangles.items()):
         patch_rect(axes[i], (0, 0), width, length_marking[i], hatch='x', fill=False)
-        for p, list_r in group.items():
-            for r in list_r:
-                obj = patch_rect(axes[i], (r.x, r.y), r.w, r.l, color=(random(), random(), random()), ec='k', lw=0.5)
-                axes[i].text(r.x + 0.5 * r.w, r.y + 0.5 * r.l, str(r.idx))
-                description = (f'Деталь:\nТолщина: {h:.1f}\n'
-                               f'Приоритет: {p:d}\n'
-                               f'Размеры: {r.w:.2f}$\\times${r.l:.2f}\n'
-                               f'Координаты: ({r.x:.2f}, {r.y:.2f})')
-                annot = get_annotation(axes[i], description, (r.x, r.y), (0, 0))
-                rectangles_with_annotation.append((obj, annot))
+        list_r = [r for p, list_r in group.items() for r in list_r]
+        xywl = layout_arrays(list_r)
+        patch_collection(axes[i], xywl, np.random.random((len(list_r), 3)), edgecolors='k', linewidths=0.5)
+        # подписи выставляются после пределов осей, от которых зависит уровень детализации
         axes[i].set_xlim(0, width)
         axes[i].set_ylim(0, length_marking[i])
+        add_labels(axes[i], xywl, [str(r.idx) for r in list_r], lod=lod)
+        pieces = [(h, p) for p, list_r in group.items() for r in list_r]
+        charts[axes[i]] = (GridIndex(xywl), pieces)
         axes[i].title.set_text(f'Height {h} mm')
         axes[i].set_xlabel(f'$x$')
         axes[i].set_ylabel(f'$y$', rotation=0)
         axes[i].set_aspect('equal', adjustable='box')
-    on_move_id = fig.canvas.mpl_connect('button_press_event', on_move(fig, rectangles_with_annotation))
+    on_move_id = fig.canvas.mpl_connect('button_press_event', on_move(fig, charts))
     plt.show()
 
 
+def piece_description(height, priority, x, y, w, l):
+    """Текст всплывающего описания прямоугольника"""
+    return (f'Деталь:\nТолщина: {height:.1f}\n'
+            f'Приоритет: {priority:d}\n'
+            f'Размеры: {w:.2f}$\\times${l:.2f}\n'
+            f'Координаты: ({x:.2f}, {y:.2f})')
+
+
 def get_annotation(ax, description, xy, pos):
     annotation = ax.annotate(description,
         xy=xy,
@@ -61,6 +198,12 @@ def create_grad(max_x):
     return a
 
 
+def grad_array(max_x):
+    """Векторный вариант create_grad"""
+    a0 = uniform(0, 1)
+    return a0 + np.arange(max_x) * ((1. - a0) / max_x)
+
+
 def visualize_mgroup(width, length, length_marking, groups):
     fig = plt.figure()
     axes = fig.add_subplot(1, 1, 1)
@@ -73,7 +216,7 @@ def visualize_mgroup(width, length, length_marking, groups):
             fill=False,
         )
     )
-    rectangles_with_annotation = []
+    xywl_all, pieces = [], []
     l = None
     for i, (height, group) in enumerate(groups.items()):
         if l is None:
@@ -81,30 +224,19 @@ def visualize_mgroup(width, length, length_marking, groups):
         else:
             l += length_marking[i-1]
         c_0 = uniform(0, 1)
-        c_1 = create_grad(max(group.keys()))
-        for k, (p, rects) in enumerate(group.items()):
-            c_2 = create_grad(len(rects))
-            for j, r in enumerate(rects):
-                obj = axes.add_patch(
-                    patches.Rectangle(
-                        (r.x, r.y+l),
-                        r.w,
-                        r.l,
-                        color=(c_0, c_1[k], c_2[j]), 
-                        ec='k', lw=0.5
-                    )
-                )
-                # axes.text(r.x + 0.45 * r.w, r.y+l + 0.45 * r.l, str(r.idx))
-                description = (f'Деталь:\nТолщина: {height:.1f}\n'
-                               f'Приоритет: {p:d}\n'
-                               f'Размеры: {r.w:.2f}$\\times${r.l:.2f}\n'
-                               f'Координаты: ({r.x:.2f}, {r.y+l:.2f})')
-                annot = get_annotation(axes, description, (r.x, r.y+l), (0, 0))
-                rectangles_with_annotation.append((obj, annot))
+        c_1 = grad_array(max(group.keys()))
+        colors = np.concatenate([np.stack([np.full(len(rects), c_0), np.full(len(rects), c_1[k]), 
+                                           grad_array(len(rects))], axis=1)
+                                 for k, rects in enumerate(group.values())] or [np.zeros((0, 3))])
+        xywl = layout_arrays([r for rects in group.values() for r in rects], dy=l)
+        patch_collection(axes, xywl, colors, edgecolors='k', linewidths=0.5)
+        xywl_all.append(xywl)
+        pieces.extend((height, p) for p, rects in group.items() for r in rects)
         if i > 0:
             axes.axhline(l, 0, width, color='k', linewidth=2)
     
-    on_move_id = fig.canvas.mpl_connect('button_press_event', on_move)
+    charts = {axes: (GridIndex(np.concatenate(xywl_all or [np.zeros((0, 4))])), pieces)}
+    on_move_id = fig.canvas.mpl_connect('button_press_event', on_move(fig, charts))
     
     axes.set_xlim(0, width)
     axes.set_ylim(0, sum(length_marking))
@@ -112,24 +244,33 @@ def visualize_mgroup(width, length, length_marking, groups):
     plt.show()
 
 
-def on_move(fig, rectangles_with_annotation):
+def on_move(fig, charts):
+    """Обработчик щелчка: показ описания прямоугольника под курсором
+
+    charts - отображение осей в пару (GridIndex, толщина и приоритет
+    каждого прямоугольника). Описание создается при первом щелчке по
+    прямоугольнику, одно на оси, и затем используется повторно.
+    Перерисовка выполняется через draw_idle.
+    """
+    annotations = {}
+
     def inner(event):
-        if event.button == 1:
-            for rectangle, annotation in rectangles_with_annotation:
-                if event.xdata is not None and event.ydata is not None:
-                    x0, y0 = rectangle.get_xy()
-                    h = rectangle.get_height()
-                    w = rectangle.get_width()
-                    if (x0 < event.xdata < x0 + w) and (y0 < event.ydata < y0 + h):
-                        # annotation.set_position((event.xdata, event.ydata))
-                        annotation.set_position((x0+w, y0))
-                        # annotation.xy = (event.xdata, event.ydata)
-                        annotation.xy = (x0, y0)
-                        annotation.set_visible(True)
-                    else:
-                        annotation.set_visible(False)
-        else:
-            for rectangle, annotation in rectangles_with_annotation:
-                annotation.set_visible(False)
-        fig.canvas.draw()
+        if event.button == 1 and (event.xdata is None or event.ydata is None):
+            return
+        for annotation in annotations.values():
+            annotation.set_visible(False)
+        if event.button == 1 and event.inaxes in charts:
+            index, pieces = charts[event.inaxes]
+            k = index.query(event.xdata, event.ydata)
+            if k is not None:
+                x0, y0, w, h = index.xywl[k].tolist()
+                description = piece_description(*pieces[k], x0, y0, w, h)
+                if event.inaxes not in annotations:
+                    annotations[event.inaxes] = get_annotation(event.inaxes, description, (x0, y0), (0, 0))
+                annotation = annotations[event.inaxes]
+                annotation.set_text(description)
+                annotation.set_position((x0+w, y0))
+                annotation.xy = (x0, y0)
+                annotation.set_visible(True)
+        fig.canvas.draw_idle()
     return inner